@@ -9,10 +9,13 @@ Part 2:
 - So scale up the grid so each pipe in the path can be represented as a 3x3 tile, which adds "gaps" that ensure all the "out" bits are connected
 - Flood the grid from the outside, so the "in" bits won't get flooded
 - Count the unflooded bits
+
+Faster alternative for part 2 (the default): walk the loop in order and treat it as a polygon
+- The shoelace formula gives its area, and Pick's theorem converts that to the number of "in" locations
+- No scaled up grid needed
 """
 
 import numpy as np
-import sys
 #from matplotlib import pyplot as plt
 
 # Make sure to have the input in the file f'input{DAY}.txt'
@@ -126,6 +129,33 @@ def next(grid, i, j, i_prev, j_prev):
     
     return i_next, j_next, i, j
 
+def get_loop(grid, i, j):
+    """Walk the main path in one direction all the way around, returning the locations in order"""
+    io, jo = PIPES[grid[i,j]][0]
+    loop = [(i,j)]
+    i_next, j_next, i_prev, j_prev = i + io, j + jo, i, j
+    while (i_next, j_next) != (i, j):
+        loop.append((i_next, j_next))
+        i_next, j_next, i_prev, j_prev = next(grid, i_next, j_next, i_prev, j_prev)
+
+    return loop
+
+def polygon_area(I, J):
+    """Count the interior and boundary lattice points of the polygon with vertices at (I[k], J[k]), traversed in order
+    Uses the shoelace formula for twice the area and Pick's theorem (A = interior + boundary/2 - 1), all in exact integer arithmetic
+    """
+    twice_area = 0
+    boundary = 0
+    n = len(I)
+    for k in range(n):
+        i1, j1 = I[k], J[k]
+        i2, j2 = I[(k+1) % n], J[(k+1) % n]
+        twice_area += i1 * j2 - i2 * j1
+        boundary += abs(i2 - i1) + abs(j2 - j1)
+
+    interior = (abs(twice_area) - boundary + 2) // 2
+    return interior, boundary
+
 def make_big_grid(grid, locs):
     """3x scale the grid and represent the pipes in the path as 3x3 tiles"""
     n, m = grid.shape
@@ -140,34 +170,31 @@ def make_big_grid(grid, locs):
     return big_grid
 
 def fill(big_grid, i, j):
-    """Fill a "out" parts of the 3x scale grid"""
-    # indexing check
-    try:
-        big_grid[i,j]
-    except:
-        return
-        
-    # pipe or already filled
-    if big_grid[i,j] in (1,2):
-        return
-    
-    # fill this entry
-    big_grid[i,j] = 2
+    """Fill a "out" parts of the 3x scale grid, starting from (i, j)
+    Uses a stack rather than recursion, so each entry is visited a bounded number of times and big grids can't overflow the stack
+    """
+    N, M = big_grid.shape
+    flood = [(i, j)]
+
+    while flood:
+        i, j = flood.pop()
+
+        # pipe or already filled
+        if big_grid[i,j] != 0:
+            continue
+
+        # fill this entry
+        big_grid[i,j] = 2
 
-    # fill the neighbors
-    for (io, jo) in [(-1,0), (0,-1), (1,0), (0,1)]:
-        fill(big_grid, i + io, j + jo)
+        # flow to the neighbors that are on the grid
+        for (io, jo) in [(-1,0), (0,-1), (1,0), (0,1)]:
+            _i, _j = i + io, j + jo
+            if 0 <= _i < N and 0 <= _j < M and big_grid[_i,_j] == 0:
+                flood.append((_i, _j))
 
 def count_unfilled(big_grid):
     """Count the number of unfilled parts, only looking at the center of the 3x3 tiles"""
-    N, M = big_grid.shape
-    n, m = N // 3, M // 3
-    c = 0
-    for i in range(n):
-        for j in range(m):
-            if big_grid[3*i+1, 3*j+1] == 0:
-                c += 1
-    return c
+    return int(np.count_nonzero(big_grid[1::3, 1::3] == 0))
 
 def part1(s):
     """Solve part 1"""
@@ -183,22 +210,25 @@ def part1(s):
     d, locs = get_far_away(grid, i, j)
     return d
     
-def part2(s):
-    """Solve part 2"""
+def part2(s, method = 'shoelace'):
+    """Solve part 2
+    method = 'shoelace' counts the "in" locations from the loop's vertices, method = 'flood' floods the 3x scale grid
+    """
     # get the path
     grid = parse_grid(s)
     i,j = find_s(grid)
     grid[i,j] = '|'
+
+    if method == 'shoelace':
+        I, J = zip(*get_loop(grid, i, j))
+        interior, boundary = polygon_area(I, J)
+        return interior
+
     d, locs = get_far_away(grid, i, j)
 
     # scale up to 3x grid
     big_grid = make_big_grid(grid, locs)
 
-    # increase recursion limit for the flooding
-    # could have avoided this if I'd done breath first search for the flooding
-    N, M = big_grid.shape
-    sys.setrecursionlimit(N*M)
-
     # flood
     fill(big_grid, 0, 0)
 
@@ -56,6 +56,13 @@ def solve_part2(imarr, x_list, y_list, N):
     return int(sum(pdist(new_coords, metric='cityblock')))
 
 
+def solve_many(imarr, x_list, y_list, N_list):
+    """total distance is linear in N, so two solves give every N"""
+    base = solve_part2(imarr, x_list, y_list, 1)
+    slope = solve_part2(imarr, x_list, y_list, 2) - base
+    return [base + (N - 1) * slope for N in N_list]
+
+
 if __name__ == '__main__':
     s, s2 = get_input(11)
     imarr = make_numpy_array(s2)
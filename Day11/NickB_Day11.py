@@ -34,34 +34,43 @@ def find_galaxies(universe):
     """List of (i,j) with the locations of galaxies"""
     return list(zip(*universe.nonzero()))
 
-def distance(galaxy1, galaxy2, I, J, expansion_factor):
-    """Distance between two galaxies, minding the expansion"""
-    i1, j1 = galaxy1
-    i2, j2 = galaxy2
-
-    # distance without expansion
-    d = abs(i1-i2) + abs(j1-j2)
-
-    # added i expansion: for each expanded i that's between the two galaxies
-    i1, i2 = min(i1, i2), max(i1, i2)
-    di = len([i for i in I if i1 < i and i < i2]) * (expansion_factor - 1)
-
-    # added j expansion: for each expanded j that's between the two galaxies
-    j1, j2 = min(j1, j2), max(j1, j2)
-    dj = len([j for j in J if j1 < j and j < j2]) * (expansion_factor - 1)
-
-    return d + di + dj
+def sum_axis_distances(x):
+    """Sum up |x1 - x2| over all pairs, using the sorted coordinates
+    In sorted order the k-th coordinate is the larger one in k pairs and the smaller one in n-1-k pairs
+    """
+    x = np.sort(x)
+    n = len(x)
+    weights = 2 * np.arange(n) - (n - 1)
+
+    # these sums can get big, so add up with Python ints to be safe
+    return sum(a * b for a, b in zip(x.tolist(), weights.tolist()))
+
+def distance_coefficients(galaxies, I, J):
+    """Coefficients (a, b) so the sum of pairwise distances is a + b * (expansion_factor - 1) for any expansion factor
+    Each expanded coordinate is x + (expansion_factor - 1) * c, where c (the number of expanded indices before x) is sorted in the same order as x,
+    so the sorted sums split into a = sum for the coordinates and b = sum for the counts
+    """
+    if len(galaxies) == 0:
+        return 0, 0
+
+    a, b = 0, 0
+    for x, E in zip(zip(*galaxies), (I, J)):
+        x = np.asarray(x, dtype='int64')
+        a += sum_axis_distances(x)
+        b += sum_axis_distances(np.searchsorted(E, x))
+
+    return a, b
+
+def sum_distances_many(galaxies, I, J, expansion_factors):
+    """Sum up the pairwise distances between all the galaxies for each of a list of expansion factors, computing the coefficients once"""
+    a, b = distance_coefficients(galaxies, I, J)
+    return [a + b * (expansion_factor - 1) for expansion_factor in expansion_factors]
 
 def sum_distances(galaxies, I, J, expansion_factor):
-    """Sum up the pairwise distances between all the galaxies"""
-    d = 0
-
-    l = len(galaxies)
-    for g1 in range(l):
-        for g2 in range(g1+1, l):
-            d += distance(galaxies[g1], galaxies[g2], I, J, expansion_factor)
-    
-    return d
+    """Sum up the pairwise distances between all the galaxies
+    Manhattan distance splits by axis, so sum each axis separately in O(n log n)
+    """
+    return sum_distances_many(galaxies, I, J, [expansion_factor])[0]
 
 def part1(s):
     """Solve part 1"""
@@ -76,6 +85,13 @@ def part2(s):
     I, J = get_expansion_indices(universe)
     galaxies = find_galaxies(universe)
     return sum_distances(galaxies, I, J, 1000000)
+
+def solve_many(s, expansion_factors):
+    """Sum of distances for each of a list of expansion factors, only parsing and summing once"""
+    universe = get_universe(s)
+    I, J = get_expansion_indices(universe)
+    galaxies = find_galaxies(universe)
+    return sum_distances_many(galaxies, I, J, expansion_factors)
     
 
 if __name__ == "__main__":
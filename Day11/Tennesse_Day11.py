@@ -17,31 +17,26 @@ def run_part1(input_text: str) -> int:
     coordinates = expand_2d(coordinates)
     logging.debug("Expanded coordinates: \n%s", display(coordinates))
 
-    total_distance = 0
-    for i, galaxy1 in enumerate(coordinates):
-        for j, galaxy2 in enumerate(coordinates):
-            if j >= i:
-                break
-            distance = get_distance(galaxy1, galaxy2)
-            logging.debug("Distance between %s and %s is %s", j + 1, i + 1, distance)
-            total_distance += distance
-    return total_distance
+    return get_total_distance(coordinates)
 
 
 def run_part2(input_text: str) -> int:
     """Expand the space between galaxies a million times, and calculate
     the total distance between all pairs of galaxies.
     """
+    return run_many(input_text, [1_000_000])[0]
+
+
+def run_many(input_text: str, expansion_factors: list[int]) -> list[int]:
+    """Calculate the total distance between all pairs of galaxies for
+    each of a list of expansion factors. The total distance is affine
+    in the expansion factor, so it's enough to compute it for factors
+    1 and 2 and extrapolate.
+    """
     coordinates = parse_input(input_text)
-    coordinates = expand_2d(coordinates, expansion_factor=1_000_000)
-    total_distance = 0
-    for i, galaxy1 in enumerate(coordinates):
-        for j, galaxy2 in enumerate(coordinates):
-            if j >= i:
-                break
-            distance = get_distance(galaxy1, galaxy2)
-            total_distance += distance
-    return total_distance
+    base = get_total_distance(expand_2d(coordinates, expansion_factor=1))
+    slope = get_total_distance(expand_2d(coordinates, expansion_factor=2)) - base
+    return [base + (expansion_factor - 1) * slope for expansion_factor in expansion_factors]
 
 
 def parse_input(input_text: str):
@@ -84,9 +79,18 @@ def display(coordinates):
     return "\n".join("".join("#" if cell else "." for cell in row) for row in grid)
 
 
-def get_distance(p1, p2):
-    """Get the distance between two points."""
-    return sum(abs(p1_i - p2_i) for p1_i, p2_i in zip(p1, p2))
+def get_total_distance(coordinates) -> int:
+    """Get the total distance between all pairs of points. The
+    distance splits into a sum over axes, and along one axis the
+    k-th smallest of n values is the larger one in k pairs and the
+    smaller one in n - 1 - k pairs, so sorting avoids the pair loop.
+    """
+    total_distance = 0
+    for x in zip(*coordinates):
+        x = sorted(x)
+        n = len(x)
+        total_distance += sum(x_k * (2 * k - n + 1) for k, x_k in enumerate(x))
+    return total_distance
 
 
 if __name__ == "__main__":
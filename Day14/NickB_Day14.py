@@ -2,12 +2,17 @@
 Day 14: Parabolic Reflector Dish
 https://adventofcode.com/2023/day/14
 
-Runtime isn't too much of an issue, so I aimed for intuitive functions over efficiency
+Store the rounded rocks and the cube rocks as boolean arrays
+The cube rocks never move, so for each direction precompute the segments between cube rocks that the rounded rocks pile up in
+Then a tilt is just counting the rounded rocks in each segment and filling each segment from the end, all vectorized
+
+Part 2: cycle until a state repeats, detected by hashing the rounded rock positions, and use the period to skip ahead
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 14
 
+import hashlib
 import numpy as np
 
 def split(s, line_char = '\n', block_char = '\n\n'):
@@ -22,100 +27,98 @@ def parse(s):
     """Parse the input text into a numpy array"""
     return np.array([list(line) for line in split(s)])
 
-def tilt_west(grid):
-    """Tilt the grid west"""
-    return np.array([tilt_row_left(row) for row in grid.copy()])
-
-def tilt_north(grid):
-    """Tilt the grid north"""
-    return tilt_west(grid.transpose()).transpose()
-
-def tilt_east(grid):
-    """Tilt the grid east"""
-    return tilt_west(grid[:,::-1])[:,::-1]
-
-def tilt_south(grid):
-    """Tilt the grid south"""
-    return tilt_north(grid[::-1,:])[::-1,:]
-
-def tilt_row_left(row):
-    """Tilt a single row 'left'"""
-    n = len(row)
-
-    # look for rounded rocks from left to right
-    for i in range(n):
-
-        # when we find a rounded rock, shift it left
-        if row[i] == 'O':
-            # scan right to left to find out where to put it
-            ii = i
-            for j in range(i-1, -1, -1):
-                if row[j] == '.':
-                    ii = j
-                else:
-                    break
-
-            # put it there
-            row[i] = '.'
-            row[ii] = 'O'
+def to_rocks(grid):
+    """Split a grid into boolean arrays for the rounded rocks and the cube rocks"""
+    return grid == 'O', grid == '#'
+
+# views of a grid that turn tilting in each direction into tilting "left" along rows
+# each of these is a numpy view, so writing to the view writes to the original grid
+VIEWS = {
+    'north' : lambda grid: grid.transpose(),
+    'west' : lambda grid: grid,
+    'south' : lambda grid: grid[::-1,:].transpose(),
+    'east' : lambda grid: grid[:,::-1],
+}
+
+def tilt_plan(cubes, view):
+    """Precompute how to tilt in one direction, since the cube rocks never move
+    Each row of the view splits into segments between cube rocks, and rounded rocks pile up at the left of their segment, so record
+    - seg: an id for the segment each location is in
+    - rank: how far each location is from the left end of its segment
+    - free: whether each location isn't a cube rock
+    all in the original orientation of the grid
+    """
+    c = view(cubes)
+    n, m = c.shape
+    J = np.arange(m)
+
+    # segments are numbered by row and by the number of cube rocks so far in the row
+    _seg = np.cumsum(c, axis=1) + (m + 1) * np.arange(n)[:,None]
+
+    # location of the last cube rock (or -1) at or before each location
+    _rank = J - np.maximum.accumulate(np.where(c, J, -1), axis=1) - 1
+
+    seg = np.empty(cubes.shape, dtype=int)
+    rank = np.empty(cubes.shape, dtype=int)
+    view(seg)[:] = _seg
+    view(rank)[:] = _rank
+
+    return seg, rank, ~cubes, n * (m + 1)
+
+def tilt_plans(cubes):
+    """Tilt plans for every direction"""
+    return {direction : tilt_plan(cubes, view) for direction, view in VIEWS.items()}
+
+def tilt(rounded, plan):
+    """Tilt the rounded rocks according to a plan: count the rocks in each segment, then fill each segment from its left end"""
+    seg, rank, free, num_segs = plan
+    counts = np.bincount(seg[rounded], minlength=num_segs)
+    return free & (rank < counts[seg])
+
+def cycle(rounded, plans):
+    """Tilt cycle"""
+    for direction in ('north', 'west', 'south', 'east'):
+        rounded = tilt(rounded, plans[direction])
+    return rounded
 
-    return row
+def score_north(rounded):
+    """Score the rounded rocks according to the load on the north side"""
+    n = rounded.shape[0]
+    return int((rounded.sum(axis=1) * np.arange(n, 0, -1)).sum())
 
-def cycle(grid):
-    """Tilt cycle"""
-    return tilt_east(tilt_south(tilt_west(tilt_north(grid))))
-
-def score_grid_west(grid):
-    """Score the grid according to the load on the west side"""
-    scores = [score_row_left(row) for row in grid]
-    return sum(scores)
-
-def score_grid_north(grid):
-    """Score the grid according to the load on the north side"""
-    return score_grid_west(grid.transpose())
-
-def score_row_left(row):
-    """Score a row according to the load on the 'left' side"""
-    n = len(row)
-    score = 0
-    s = n
-    for x in row:
-        if x == 'O':
-            score += s
-        s -= 1
-    return score
-
-def nice(grid):
-    """String representation of a grid"""
-    return '\n'.join([''.join(row) for row in grid])
-    
 def part1(s):
     """Solve part 1"""
-    grid = parse(s)
-    return score_grid_north(tilt_north(grid))
+    rounded, cubes = to_rocks(parse(s))
+    return score_north(tilt(rounded, tilt_plan(cubes, VIEWS['north'])))
     
+def fingerprint(rounded):
+    """Compact hash of the rounded rock positions"""
+    return hashlib.blake2b(np.packbits(rounded).tobytes(), digest_size=16).digest()
+
+def load_after_cycles(rounded, plans, num_cycles):
+    """North load after num_cycles tilt cycles
+    Cycle until a state repeats, keeping only the first-seen index of each state's fingerprint and the load after each cycle,
+    then the state after num_cycles is the one at the same point in the loop
+    """
+    first_seen = dict()
+    loads = []
+    for k in range(num_cycles + 1):
+        key = fingerprint(rounded)
+        if key in first_seen:
+            start = first_seen[key]
+            period = k - start
+            return loads[start + (num_cycles - start) % period]
+        first_seen[key] = k
+        loads.append(score_north(rounded))
+        rounded = cycle(rounded, plans)
+
+    # no repeats before getting to num_cycles
+    return loads[num_cycles]
+
 def part2(s):
     """Solve part 2"""
-    grid = parse(s)
-
-    # perform cycles until we repeat a previous one, tracking the history with both np.array and string representations
-    nice_grid = nice(grid)
-    history = [grid.copy()]
-    history_nice = [nice_grid]
-    while nice_grid not in history_nice[:-1]:
-        grid = cycle(grid)
-        nice_grid = nice(grid)
-        history.append(grid.copy())
-        history_nice.append(nice_grid)
-
-    # this next bit returns [81, 119], so the period is 38
-    #nice_grid = history_nice[-1]
-    #[i for i, _nice_grid in enumerate(history_nice) if nice_grid == _nice_grid]
-    
-    # 1000000000 = 94 (mod 38) and 94 > 81 means we've entered the main loop after 94 cycles
-    # so the state after 1000000000 cycles will be the same as the state after 94 cycles
-
-    return score_grid_north(history[94])
+    rounded, cubes = to_rocks(parse(s))
+    return load_after_cycles(rounded, tilt_plans(cubes), 1000000000)
 
 
 if __name__ == "__main__":
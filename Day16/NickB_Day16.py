@@ -3,12 +3,25 @@ Day 16: The Floor Will Be Lava
 https://adventofcode.com/2023/day/16
 
 Represent beams as (i, j, io, jo) giving the location and direction vector
+
+Part 2 speedup: rather than spreading every starting beam cell by cell, work with "segments" between optical elements
+- Precompute a jump table giving the next non-empty cell from each location in each direction
+- Make a graph whose nodes are beams arriving at an optical element, with an edge for each beam it sends out to the next element
+- Beams can loop, so condense the graph into strongly connected components, whose nodes all energize the same cells
+- Record the energized cells of each component as a bitset (a Python int with a bit per location), the union of its own segments and the bitsets of the components downstream
+- Then any starting beam is just one jump to its first element plus a lookup
+
+Alternatively part2_parallel spreads the starting beams directly, split across a process pool
+- The grid is put in shared memory once, rather than pickled for every task
+- Each worker sends back a bitset of energized locations instead of the set of beams, and the parent just takes the max
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 16
 
+import os
 import numpy as np
+from multiprocessing import Pool, shared_memory
 
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
@@ -144,11 +157,145 @@ def part1(s):
     beams_history = spread((1, 1, 0, 1), grid)
     return count_locations(beams_history)
     
-def part2(s):
-    """Solve part 2"""
-    grid = parse_grid(s)
+# direction vectors in the order used by the jump table
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+def jump_table(grid):
+    """For each direction and location, the flat index i*m+j of the first non-empty cell (optical element or wall) at or after that location"""
+    n, m = grid.shape
+    empty = grid == '.'
+    jumps = np.zeros((len(DIRECTIONS), n, m), dtype=int)
+    flat = np.arange(n*m).reshape(n, m)
+
+    for d, (io, jo) in enumerate(DIRECTIONS):
+        # sweep against the direction of travel, so the next cell is always done already
+        I = range(n)[::-1] if io == 1 else range(n)
+        J = range(m)[::-1] if jo == 1 else range(m)
+        for i in I:
+            for j in J:
+                if empty[i,j]:
+                    jumps[d,i,j] = jumps[d,i+io,j+jo]
+                else:
+                    jumps[d,i,j] = flat[i,j]
+
+    return jumps
+
+def jump(beam, grid, jumps):
+    """Follow a beam through empty space, returning the bitset of cells it covers (including the element it stops at) and the beam arriving at that element, or None for a wall"""
+    i, j, io, jo = beam
+    n, m = grid.shape
+    k = int(jumps[DIRECTIONS.index((io, jo)), i, j])
+    i_end, j_end = divmod(k, m)
+
+    cells = 0
+    while (i, j) != (i_end, j_end):
+        cells |= 1 << (i*m + j)
+        i, j = i + io, j + jo
+
+    if grid[i_end, j_end] == '#':
+        return cells, None
+    return cells | 1 << k, (i_end, j_end, io, jo)
+
+def element_graph(grid, jumps):
+    """Graph with nodes for each beam arriving at an optical element, giving the bitset of cells on its outgoing segments and the nodes those segments arrive at"""
+    n, m = grid.shape
+    graph = dict()
+    for i in range(n):
+        for j in range(m):
+            if grid[i,j] in '.#':
+                continue
+            for io, jo in DIRECTIONS:
+                cells = 1 << (i*m + j)
+                nodes = []
+                for beam in propagate((i, j, io, jo), grid):
+                    _cells, node = jump(beam, grid, jumps)
+                    cells |= _cells
+                    if node is not None:
+                        nodes.append(node)
+                graph[(i, j, io, jo)] = (cells, nodes)
+
+    return graph
+
+def energized_sets(graph):
+    """Bitset of cells energized by each node of the graph
+    Uses Tarjan's algorithm (iteratively), which finishes strongly connected components in reverse topological order,
+    so the bitsets downstream of a component are always ready by the time we get to it
+    """
+    index = dict()
+    low = dict()
+    on_stack = set()
+    stack = []
+    energized = dict()
+
+    for root in graph:
+        if root in index:
+            continue
+
+        # each entry is a node and an iterator over its neighbors, to avoid recursion
+        work = [(root, iter(graph[root][1]))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
 
-    # figure out all the possible starting beams
+        while work:
+            node, neighbors = work[-1]
+            for _node in neighbors:
+                if _node not in index:
+                    index[_node] = low[_node] = len(index)
+                    stack.append(_node)
+                    on_stack.add(_node)
+                    work.append((_node, iter(graph[_node][1])))
+                    break
+                elif _node in on_stack:
+                    low[node] = min(low[node], index[_node])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+
+                # node is the root of a component, so pop the component and union up its bitsets
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        _node = stack.pop()
+                        on_stack.remove(_node)
+                        component.append(_node)
+                        if _node == node:
+                            break
+
+                    cells = 0
+                    for _node in component:
+                        _cells, _nodes = graph[_node]
+                        cells |= _cells
+                        for __node in _nodes:
+                            # nodes in this component aren't ready yet, but they're covered by this union anyway
+                            cells |= energized.get(__node, 0)
+                    for _node in component:
+                        energized[_node] = cells
+
+    return energized
+
+def to_bitset(beams_history, grid):
+    """Bitset (a Python int with a bit per location) of the locations covered by a set of beams"""
+    n, m = grid.shape
+    cells = 0
+    for (i,j,io,jo) in beams_history:
+        cells |= 1 << (i*m + j)
+    return cells
+
+def attach_grid(name, shape, dtype):
+    """Process pool initializer: point the worker's global grid at the shared memory block"""
+    global grid, shm
+    shm = shared_memory.SharedMemory(name=name)
+    grid = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def energize(beam):
+    """Process pool task: spread a beam over the shared grid, returning the bitset of energized locations"""
+    global grid
+    return to_bitset(spread(beam, grid), grid)
+
+def starting_beams(grid):
+    """All the possible starting beams, coming in from the edges"""
     beams_starting = []
     n, m = grid.shape
     
@@ -172,8 +319,44 @@ def part2(s):
         beams_starting.append((1, j, 1, 0))
         beams_starting.append((n-2, j, -1, 0))
 
-    # for each starting beam count up the locations it ends up covering, and find the biggest one
-    return max([count_locations(spread(beam, grid)) for beam in beams_starting])
+    return beams_starting
+
+def part2(s):
+    """Solve part 2"""
+    grid = parse_grid(s)
+
+    # precompute the energized cells downstream of every optical element
+    jumps = jump_table(grid)
+    energized = energized_sets(element_graph(grid, jumps))
+
+    # for each starting beam jump to the first element and look up the cells it ends up covering, and find the biggest one
+    best = 0
+    for beam in starting_beams(grid):
+        cells, node = jump(beam, grid, jumps)
+        if node is not None:
+            cells |= energized[node]
+        best = max(best, cells.bit_count())
+
+    return best
+
+def part2_parallel(s, processes = None):
+    """Solve part 2, spreading the starting beams across a process pool"""
+    grid = parse_grid(s)
+
+    # copy the grid into shared memory for the workers
+    shm = shared_memory.SharedMemory(create=True, size=grid.nbytes)
+    try:
+        shared_grid = np.ndarray(grid.shape, dtype=grid.dtype, buffer=shm.buf)
+        shared_grid[:] = grid
+
+        beams_starting = starting_beams(grid)
+        processes = processes or os.cpu_count()
+        chunksize = max(1, len(beams_starting) // (4 * processes))
+        with Pool(processes, initializer=attach_grid, initargs=(shm.name, grid.shape, grid.dtype)) as pool:
+            return max(cells.bit_count() for cells in pool.imap_unordered(energize, beams_starting, chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
     
 
 if __name__ == "__main__":
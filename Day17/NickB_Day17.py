@@ -2,22 +2,24 @@
 Day 17: Clumsy Crucible
 https://adventofcode.com/2023/day/17
 
-Approach: focus on "states" (i, j, io, jo, k) giving
+Approach: focus on "states" (a, i, j) giving
 - (i, j): grid location
-- (io, jo): vector of the movement that brought us into this location
-- k: number of consecutive (io, jo) movements we've just finished making
+- a: axis (0 = vertical, 1 = horizontal) of the straight run that brought us into this location
 
-For each state, record the heat loss to the target (n-1, m-1) location *so far* - initialize these all as np.inf.
-Loop through all the states and update them based on their neighbors (but not recursively updating the neighbors), until we reach steady state.
-This effectively means it'll consider more complex paths until we don't need to consider additional complexity.
+Each move from a state is a whole straight run: turn onto the other axis and go between min_run and max_run steps.
+This means the same solver handles part 1 (1 to 3 steps) and part 2 (4 to 10 steps), and the number of states doesn't depend on the limits.
 
-My code runs in 30 seconds for part 1 and 90 seconds for part 2.
-One good speedup would be using a queue to only attempt updates where necessary (on neighbors of states that got updates), rather than iterating through all states until steady state.
+For each state, record the heat loss from the start (0, 0) location *so far* in a dense np.array indexed by state - initialize these all as np.inf.
+Run Dijkstra's algorithm: pop the state with the least heat loss from a priority queue and update only its neighbors.
+States come off the queue in order of heat loss, so the first time we pop a state at the target (n-1, m-1) location we have the answer.
+
+This replaced a loop that updated every state until reaching steady state, which ran in 30 seconds for part 1 and 90 seconds for part 2.
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 17
 
+import heapq
 import numpy as np
 
 def split(s, line_char = '\n', block_char = '\n\n'):
@@ -37,155 +39,65 @@ def print_grid(grid):
     for line in grid:
         print(''.join([str(x) for x in line]))
 
-def update1(state):
-    """Update the heat loss of a state (i, j, io, jo, k) [location] + [direction] + [number of steps so far in that direction] to the end location, with part 1 logic"""
-    global heat_losses, grid
-    i, j, io, jo, k = state
-
-    # trivial if we're at the end location
+def neighbors(grid, state, h, min_run, max_run):
+    """States reachable in one straight run from a state (a, i, j) [axis of the run that brought us here] + [location], along with their heat losses
+    Runs have to turn onto the other axis and go between min_run and max_run steps, so only those states are ever expanded
+    """
+    a, i, j = state
     n, m = grid.shape
-    if (i, j) == (n-1, m-1):
-        heat_losses[state] = grid[n-1, m-1]
-        return False
-
-    # otherwise, use the neighbors to update the current guess at the answer
-    ds = []
-    for _io, _jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-        # avoid backtracking
-        if (_io, _jo) == (-io, -jo):
-            continue
-        # keep track if we're going in the same direction
-        elif (_io, _jo) == (io, jo):
-            _k = k + 1
-        else:
-            _k = 1
-
-        # lookup, with a distance of np.inf if the state we're looking at isn't valid (ex. k > 3 or it's off the board)
-        ds.append(heat_losses.get((i+_io, j+_jo, _io, _jo, _k), np.inf))
-
-    # best distance
-    d = min(ds) + grid[i,j]
-
-    # return whether this gave an update
-    if heat_losses[state] != d:
-        heat_losses[state] = d
-        return True
-    else:
-        return False
+    _a = 1 - a
+
+    for sign in (-1, 1):
+        io, jo = (sign, 0) if _a == 0 else (0, sign)
+        _i, _j, _h = i, j, h
+        for k in range(1, max_run + 1):
+            _i, _j = _i + io, _j + jo
+            if not (0 <= _i < n and 0 <= _j < m):
+                break
+            _h += grid[_i, _j]
+            if k >= min_run:
+                yield (_a, _i, _j), _h
+
+def crucible(grid, min_run, max_run):
+    """Find the least heat loss from the top left to the bottom right location, using Dijkstra's algorithm
+    The crucible has to move at least min_run and at most max_run steps in a straight line before turning (or stopping)
+    Heat losses *so far* are stored in a dense array indexed by state (a, i, j), so each state is only settled once
+    """
+    n, m = grid.shape
+    heat_losses = np.full((2, n, m), np.inf)
 
-def update2(state):
-    """Update the heat loss of a state (i, j, io, jo, k) [location] + [direction] + [number of steps so far in that direction] to the end location, with part 2 logic"""
-    global heat_losses, grid
-    i, j, io, jo, k = state
+    # we can start off along either axis
+    queue = []
+    for a in (0, 1):
+        heat_losses[a, 0, 0] = 0
+        heapq.heappush(queue, (0, (a, 0, 0)))
 
-    # trivial if we're at the end location with at least 4 moves
-    n, m = grid.shape
-    if (i, j) == (n-1, m-1) and k >= 4:
-        heat_losses[state] = grid[n-1, m-1]
-        return False
+    while queue:
+        h, state = heapq.heappop(queue)
 
-    # otherwise, use the neighbors to update the current guess at the answer
-    ds = []
+        # stale entry, a better path to this state was already found
+        if h > heat_losses[state]:
+            continue
+
+        # states come off the queue in order of heat loss, so the first end state is the best
+        if state[1:] == (n-1, m-1):
+            return int(h)
+
+        for _state, _h in neighbors(grid, state, h, min_run, max_run):
+            if _h < heat_losses[_state]:
+                heat_losses[_state] = _h
+                heapq.heappush(queue, (_h, _state))
 
-    # if we can't turn yet
-    if k < 4:
-        ds.append(heat_losses.get((i+io, j+jo, io, jo, k+1), np.inf))
-    # if we can turn
-    else:
-        for _io, _jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-            if (_io, _jo) == (-io, -jo):
-                continue
-            elif (_io, _jo) == (io, jo):
-                _k = k + 1
-            else:
-                _k = 1
-    
-            ds.append(heat_losses.get((i+_io, j+_jo, _io, _jo, _k), np.inf))
-
-    # best distance
-    d = min(ds) + grid[i,j]
-
-    # return whether this gave an update
-    if heat_losses[state] != d:
-        heat_losses[state] = d
-        return True
-    else:
-        return False
-        
 def part1(s):
     """Solve part 1"""
-    global grid, heat_losses
-    
     grid = parse_grid(s)
     #print_grid(grid)
+    return crucible(grid, 1, 3)
 
-    # locations to track the distances for
-    n, m = grid.shape
-    I = list(range(n))[::-1]
-    J = list(range(m))[::-1]
-    
-    # initialize the current best guesses at distances to the end
-    heat_losses = dict()
-    for i in I:
-        for j in J:
-            for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                for k in (1, 2, 3):
-                    heat_losses[(i, j, io, jo, k)] = np.inf
-
-    # update those best guesses until nothing is updated anymore
-    # doing both "i then j" and "j then i" looping in case that helps get rid of np.infs faster
-    any_updates = True
-    while any_updates:
-        any_updates = False
-        for i in I:
-            for j in J:
-                for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                    for k in (1, 2, 3):
-                        any_updates = update1((i, j, io, jo, k)) | any_updates
-        for j in J:
-            for i in I:
-                for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                    for k in (1, 2, 3):
-                        any_updates = update1((i, j, io, jo, k)) | any_updates
-
-    # return the minimum distance from the 2 possible starting moves (down versus right)
-    return min(heat_losses[(0, 1, 0, 1, 1)], heat_losses[(1, 0, 1, 0, 1)])
-    
 def part2(s):
     """Solve part 2"""
-    global grid, heat_losses
-    
     grid = parse_grid(s)
-    
-    # locations to track the distances for
-    n, m = grid.shape
-    I = list(range(n))[::-1]
-    J = list(range(m))[::-1]
-    
-    # initialize
-    heat_losses = dict()
-    for i in I:
-        for j in J:
-            for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                for k in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
-                    heat_losses[(i, j, io, jo, k)] = np.inf
-
-    # updates
-    any_updates = True
-    while any_updates:
-        any_updates = False
-        for i in I:
-            for j in J:
-                for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                    for k in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
-                        any_updates = update2((i, j, io, jo, k)) | any_updates
-        for j in J:
-            for i in I:
-                for io, jo in ((-1, 0), (0, -1), (1, 0), (0, 1)):
-                    for k in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
-                        any_updates = update2((i, j, io, jo, k)) | any_updates
-
-    return min(heat_losses[(0, 1, 0, 1, 1)], heat_losses[(1, 0, 1, 0, 1)])
+    return crucible(grid, 4, 10)
 
 
 if __name__ == "__main__":
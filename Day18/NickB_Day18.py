@@ -8,6 +8,11 @@ Approach: optimized for part 2, using a "block grid"
 - Paritition into the blocks according to the locations of vertices: if there are vertices at i1 and i2 and no vertices at any i with i1 < i < i2 then [i1+1, ..., i2-1] can be a block, since that region is either all on the inside or all on the outside
 - Do the flooding on the block grid, and determine areas by using the dimensions of the blocks
 
+Faster alternative (the default): we only need the area enclosed by the vertices of the path
+- The shoelace formula gives the area of the polygon through the centers of the path's squares
+- Pick's theorem converts that to the number of interior squares, then add the squares on the path itself
+- This is O(vertices) with exact integer arithmetic, and doesn't allocate any grid
+
 Ex. vertices of the path in the full grid:
 *------*
 --------
@@ -64,8 +69,10 @@ def move_step(i, j, step):
     (io, jo), n = step
     return i + n * io, j + n * jo
 
-def find_area(steps):
-    """Main method: finds the are outlined by a sequence of steps"""
+def find_area(steps, method = 'shoelace'):
+    """Main method: finds the are outlined by a sequence of steps
+    method = 'shoelace' counts the area directly from the vertices, method = 'flood' floods the block grid
+    """
     
     # lists I, J giving (i, j) of vertices along the path
     i, j = 0, 0
@@ -76,6 +83,10 @@ def find_area(steps):
         I.append(i)
         J.append(j)
 
+    if method == 'shoelace':
+        interior, boundary = polygon_area(I, J)
+        return interior + boundary
+
     # narrow down to possible vertex locations which set up the block grid
     Iv = sorted(set(I))
     Jv = sorted(set(J))
@@ -111,6 +122,22 @@ def find_area(steps):
 
     return area
 
+def polygon_area(I, J):
+    """Count the interior and boundary lattice points of the polygon with vertices at (I[k], J[k]), traversed in order
+    Uses the shoelace formula for twice the area and Pick's theorem (A = interior + boundary/2 - 1), all in exact integer arithmetic
+    """
+    twice_area = 0
+    boundary = 0
+    n = len(I)
+    for k in range(n):
+        i1, j1 = I[k], J[k]
+        i2, j2 = I[(k+1) % n], J[(k+1) % n]
+        twice_area += i1 * j2 - i2 * j1
+        boundary += abs(i2 - i1) + abs(j2 - j1)
+
+    interior = (abs(twice_area) - boundary + 2) // 2
+    return interior, boundary
+
 def to_intervals(I):
     """Turn a list of "vertex" indices into a list of intervals that respects the vertices
     i.e. for each vertex i there is an interval (i, i)
@@ -9,23 +9,27 @@ The code is mainly for part 1, using several classes to organize things:
 - FlipFlop: implements flip flop module logic for when the module receives a signal
 - Conjunction: implements conjunction module logic for when the module receives a signal
 - Null: module without any specific logic (this is what rx is)
+- CompiledScheduler: a fast replacement for Scheduler, which lowers the module objects to integer ids and flat lists and runs the pulses in a tight loop
 
 The function set_up_modules creates the modules and scheduler: it's a bit of a mess, since I have to make the module objects and then go about linking their inputs/outputs
 
 Part 1 solution: the scheduler keeps count of low and high signals, so just run 1,000 button presses and read off those numbers
+If the state of the circuit (flip flop states and conjunction memories) repeats before then, stop and extrapolate the counts, which works for any number of presses
 
-Part 2 solution: I did this in a notebook, with the help of a SmartScheduler class which tracks when a few key modules send high signals
-I did the following in the notebook:
-- Print out some info of the modules that feed into rx: it's a few layers of conjunction modules, and you can check that when modules dj, rr, pb, nl give high signals we'll get a low signal from rx
-- Ran the SmartScheduler for 100_000 button presses just to be sure I have enough data on dj, rr, pb, nl to find out when they give high signals
-- For each of those modules, determine the period between high signals and when it first gives a high signal
-- Since the periods match the times of the first high signals, an lcm of the periods gives the solution
+Part 2 solution: originally done in a notebook, tracking when a few hard-coded key modules sent high signals; now the key modules are found from the circuit
+- rx gets a low signal when the conjunction module in front of it has had high signals from all of its inputs (the "feeders"), so walk backwards from rx to find those
+- Push the button until each feeder has sent high signals on evenly spaced button pushes, giving when it first does so and its period
+- Combine those with the Chinese remainder theorem (which is just an lcm when the periods match the times of the first high signals)
+- Optionally (split = True), first split the circuit into the independent clusters between the broadcaster and rx, each with one feeder, and simulate them separately (possibly in separate processes)
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 20
 
 from collections import deque 
+import hashlib
+from math import gcd, lcm
+from multiprocessing import Pool
 
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
@@ -146,20 +150,132 @@ class Scheduler:
         # add it to the queue
         self.queue.append((module_from, pulse, module_to))
 
-class SmartScheduler(Scheduler):
-    """A scheduler that tracks when the key modules for part 2 give high signals"""
+class CompiledScheduler:
+    """A much faster scheduler: compiles the module objects down to integer ids and flat lists, then runs the pulses in a tight loop
+    - each module gets an id, with its type in self.kinds and its outputs in self.outputs as (id, slot) pairs
+    - flip flop states are a bit per module in self.flips
+    - conjunction memories are a bit per input "slot" in self.memory, with a count of high inputs per conjunction in self.highs, so there's no need to re-scan all the inputs
+    - the queue is a preallocated ring buffer of (id, slot, pulse) entries, reused across button pushes
+    """
 
-    TRACK = ['dj', 'rr', 'pb', 'nl']
+    BROADCAST, FLIPFLOP, CONJUNCTION, NULL = range(4)
 
-    def __init__(self, scheduler):
-        super().__init__(scheduler.modules)
-        self.histories = {name : [] for name in self.TRACK}
-
-    def send(self, module_from, pulse, module_to):
-        name = module_from.name
-        if name in self.TRACK and pulse == 0:
-            self.histories[name].append(self.button_pushes)
-        super().send(module_from, pulse, module_to)
+    def __init__(self, scheduler, capacity = 1024):
+        modules = scheduler.modules
+        self.names = list(modules.keys())
+        self.ids = {name : k for k, name in enumerate(self.names)}
+
+        kinds = {Broadcast : self.BROADCAST, FlipFlop : self.FLIPFLOP, Conjunction : self.CONJUNCTION, Null : self.NULL}
+        self.kinds = [kinds[type(modules[name])] for name in self.names]
+
+        # a slot for each (input, conjunction) pair to hold the conjunction's memory of that input
+        slots = {}
+        for name in self.names:
+            for _name in modules[name].outputs_names:
+                if self.kinds[self.ids[_name]] == self.CONJUNCTION:
+                    slots[(name, _name)] = len(slots)
+        self.outputs = [[(self.ids[_name], slots.get((name, _name), -1)) for _name in modules[name].outputs_names] for name in self.names]
+        self.num_inputs = [len(modules[name].inputs_names) for name in self.names]
+
+        # copy over the current state of the modules
+        self.flips = bytearray(len(self.names))
+        self.memory = bytearray(len(slots))
+        self.highs = [0] * len(self.names)
+        for name, module in modules.items():
+            k = self.ids[name]
+            if self.kinds[k] == self.FLIPFLOP:
+                self.flips[k] = module.state
+            elif self.kinds[k] == self.CONJUNCTION:
+                for _name, state in module.states.items():
+                    self.memory[slots[(_name, name)]] = state
+                    self.highs[k] += state
+
+        self.broadcaster = self.ids['broadcaster']
+        self.low_count = scheduler.low_count
+        self.high_count = scheduler.high_count
+        self.button_pushes = scheduler.button_pushes
+
+        # the queue, as a ring buffer of (id, slot, pulse) entries, with the capacity rounded up to a power of 2 so indices wrap with a bit mask
+        self.capacity = 1 << max(0, capacity - 1).bit_length()
+        capacity = self.capacity
+        self.queue = [None] * capacity
+
+        # modules to watch for given pulses, as {id : pulse}, with the button pushes they sent them on
+        self.tracked = {}
+        self.histories = {}
+
+    def track(self, names, pulse = 1):
+        """Record the button pushes on which the named modules send the given pulse"""
+        for name in names:
+            self.tracked[self.ids[name]] = pulse
+            self.histories[name] = []
+
+    def snapshot(self):
+        """Fixed size fingerprint of the whole circuit state: a hash of the flip flop bits and the conjunction memories"""
+        return hashlib.blake2b(self.flips + self.memory, digest_size=16).digest()
+
+    def grow(self, head, tail):
+        """Double the size of the ring buffer, unwrapping the queued entries to the start"""
+        mask = self.capacity - 1
+        entries = [self.queue[(head + k) & mask] for k in range(tail - head)]
+        self.capacity *= 2
+        self.queue = entries + [None] * (self.capacity - len(entries))
+        return 0, len(entries)
+
+    def button_push(self, times = 1):
+        """Push the button, possibly many times"""
+        kinds, outputs, num_inputs = self.kinds, self.outputs, self.num_inputs
+        flips, memory, highs = self.flips, self.memory, self.highs
+        tracked, histories, names = self.tracked, self.histories, self.names
+        FLIPFLOP, CONJUNCTION, NULL = self.FLIPFLOP, self.CONJUNCTION, self.NULL
+        queue, capacity = self.queue, self.capacity
+        mask = capacity - 1
+
+        for _ in range(times):
+            self.button_pushes += 1
+            low_count = 1
+            high_count = 0
+
+            # the button sends a low pulse to the broadcaster
+            queue[0] = (self.broadcaster, -1, 0)
+            head, tail = 0, 1
+
+            while head < tail:
+                module, slot, pulse = queue[head & mask]
+                head += 1
+
+                # module logic, deciding which pulse to send (if any)
+                kind = kinds[module]
+                if kind == FLIPFLOP:
+                    if pulse:
+                        continue
+                    pulse = flips[module] = 1 - flips[module]
+                elif kind == CONJUNCTION:
+                    highs[module] += pulse - memory[slot]
+                    memory[slot] = pulse
+                    pulse = 0 if highs[module] == num_inputs[module] else 1
+                elif kind == NULL:
+                    continue
+
+                if tracked and tracked.get(module) == pulse:
+                    histories[names[module]].append(self.button_pushes)
+
+                # send the pulse to all the outputs
+                _outputs = outputs[module]
+                if pulse:
+                    high_count += len(_outputs)
+                else:
+                    low_count += len(_outputs)
+                if tail - head + len(_outputs) > capacity:
+                    head, tail = self.grow(head, tail)
+                    queue, capacity = self.queue, self.capacity
+                    mask = capacity - 1
+                for _module, _slot in _outputs:
+                    queue[tail & mask] = (_module, _slot, pulse)
+                    tail += 1
+
+            self.low_count += low_count
+            self.high_count += high_count
 
 class Module:
     """Generic module"""
@@ -237,63 +353,154 @@ class Null(Module):
     def receive(self, pulse, module):
         pass
 
+def count_pulses(scheduler, num_pushes):
+    """Counts of (low, high) pulses after num_pushes button pushes
+    Pushes the button until the state of the circuit repeats, then extrapolates the counts using the period
+    Uses Brent's cycle detection, so only one saved state (with its counts) is kept: the state is compared against the one saved at the last power of 2,
+    and once it repeats every period adds the same number of pulses, so finish by replaying the partial period
+    """
+    saved = scheduler.snapshot(), scheduler.low_count, scheduler.high_count
+    power = period = 1
+    for k in range(num_pushes):
+        scheduler.button_push()
+        key = scheduler.snapshot()
+        if key == saved[0]:
+            q, r = divmod(num_pushes - (k + 1), period)
+            low = q * (scheduler.low_count - saved[1])
+            high = q * (scheduler.high_count - saved[2])
+            scheduler.button_push(r)
+            return scheduler.low_count + low, scheduler.high_count + high
+
+        # move the saved state up to here at each power of 2
+        if period == power:
+            saved = key, scheduler.low_count, scheduler.high_count
+            power *= 2
+            period = 0
+        period += 1
+
+    # no repeats before getting to num_pushes
+    return scheduler.low_count, scheduler.high_count
+
 def part1(s):
     """Solve part 1"""
-    scheduler = set_up_modules(s)
-    [scheduler.button_push() for _ in range(1000)]
-    low = scheduler.low_count
-    high = scheduler.high_count
+    scheduler = CompiledScheduler(set_up_modules(s))
+    low, high = count_pulses(scheduler, 1000)
     return low * high
     
-def part2(s):
-    """Solve part 2"""
-    # the print outs that tell me to focus on when dj, rr, pb, nl give high signals
-    # note how after these nodes things get complicated, so I just focused on them and hoped that this would be enough
-    print()
-    print('-' * 50)
-    print('Understanding the modules that feed into rx')
+def find_feeders(scheduler, target = 'rx'):
+    """Walk backwards from the target to the modules feeding it
+    The target gets a low pulse when the conjunction in front of it has most recently had high pulses from all of its inputs, so those inputs are the feeders
+    """
+    modules = scheduler.modules
+    inputs = modules[target].inputs
+    assert len(inputs) == 1 and isinstance(inputs[0], Conjunction), f'{target} should be fed by a single conjunction module'
+    return inputs[0].inputs_names
+
+def crt(residues, moduli):
+    """Chinese remainder theorem, allowing moduli that aren't coprime: returns (x, lcm of the moduli) with x = residue (mod modulus) for each pair, or None if there's no solution"""
+    x, m = 0, 1
+    for r, n in zip(residues, moduli):
+        g = gcd(m, n)
+        if (r - x) % g != 0:
+            return None
+        # solve x + m * k = r (mod n) for k
+        k = (r - x) // g * pow(m // g, -1, n // g) % (n // g)
+        x += m * k
+        m = lcm(m, n)
+        x %= m
+    return x, m
+
+def find_periods(scheduler, feeders, max_pushes = 10_000_000):
+    """Push the button until each feeder has sent high pulses on 3 button pushes with evenly spaced gaps, returning {name : (first push, period)}"""
+    scheduler.track(feeders, 1)
+    periods = {}
+    while len(periods) < len(feeders):
+        assert scheduler.button_pushes < max_pushes, 'Feeder periods not found'
+        scheduler.button_push()
+        for name in feeders:
+            if name in periods:
+                continue
+            pushes = sorted(set(scheduler.histories[name]))
+            if len(pushes) >= 3 and pushes[-1] - pushes[-2] == pushes[-2] - pushes[-3]:
+                periods[name] = (pushes[-3], pushes[-1] - pushes[-2])
+    return periods
+
+def first_common_push(periods):
+    """The first push when all the feeders send high pulses, at or after each one has started its cycle, given {name : (first push, period)}"""
+    firsts = [first for first, period in periods.values()]
+    solution = crt(firsts, [period for first, period in periods.values()])
+    assert solution is not None, 'The feeders never all send high pulses on the same push'
+    x, m = solution
+    start = max(firsts)
+    return x + (start - x + m - 1) // m * m
+
+def module_line(module):
+    """Inverse of create_module_basic: the line of input for a module"""
+    prefix = {Broadcast : '', FlipFlop : '%', Conjunction : '&'}[type(module)]
+    return f'{prefix}{module.name} -> {", ".join(module.outputs_names)}'
+
+def split_circuit(s, target = 'rx'):
+    """Split the circuit into the independent clusters between the broadcaster and the conjunction in front of the target
+    Returns a list of (input, feeder) for each cluster: the input has the broadcaster only feeding that cluster,
+    and pulses out of the cluster go to modules that set_up_modules will make Null
+    """
     scheduler = set_up_modules(s)
-    layers = [
-        ['rx'],
-        ['ns'],
-        ['dc', 'rv', 'vp', 'cq'],
-        ['dj', 'rr', 'pb', 'nl']
-    ]
-    for layer in layers:
-        for name in layer:
-            module = scheduler.modules[name]
-            print(name, module.__class__, 'has inputs', module.inputs_names)
-        print()
-
-    # use the SmartScheduler to run 100_000 button presses and track when dj, rr, pb, nl give high signals
-    scheduler = SmartScheduler(set_up_modules(s))
-    for module in scheduler.modules.values():
-        module.scheduler = scheduler
-    [scheduler.button_push() for _ in range(100_000)]
-
-    # checking the spacing between the low signals, they're consistent
-    print()
-    print('-' * 50)
-    print('Checking periods')
-    import numpy as np
-    for name in scheduler.TRACK:
-        history = scheduler.histories[name]
-        print(np.diff(sorted(set(history))))
-
-    # and we can verify those periods are also the first button press that these modules got low signals
-    print()
-    print('-' * 50)
-    print('Checking first high signal times')
-    for name in scheduler.TRACK:
-        history = scheduler.histories[name]
-        print(history[0])
+    modules = scheduler.modules
+    feeders = find_feeders(scheduler, target)
+    cut = {'broadcaster', target, modules[target].inputs_names[0]}
+
+    # weakly connected components of what's left, with a stack based search
+    cluster_of = {}
+    clusters = []
+    for name in modules:
+        if name in cut or name in cluster_of:
+            continue
+        cluster = []
+        stack = [name]
+        cluster_of[name] = len(clusters)
+        while stack:
+            _name = stack.pop()
+            cluster.append(_name)
+            for __name in modules[_name].inputs_names + modules[_name].outputs_names:
+                if __name not in cut and __name not in cluster_of:
+                    cluster_of[__name] = len(clusters)
+                    stack.append(__name)
+        clusters.append(cluster)
+
+    out = []
+    for cluster in clusters:
+        _feeders = [name for name in feeders if name in cluster]
+        assert len(_feeders) == 1, 'each cluster should have exactly one feeder'
+        entries = [name for name in modules['broadcaster'].outputs_names if name in cluster]
+        # Null modules have no line of their own, set_up_modules recreates them from the outputs
+        lines = [f'broadcaster -> {", ".join(entries)}'] + [module_line(modules[name]) for name in cluster if type(modules[name]) != Null]
+        out.append(('\n'.join(lines), _feeders[0]))
+
+    return out
+
+def cluster_period(cluster):
+    """Find the (first push, period) of the feeder of a cluster, simulating just that cluster"""
+    s, feeder = cluster
+    return find_periods(CompiledScheduler(set_up_modules(s)), [feeder])[feeder]
+
+def part2(s, split = False, processes = 1):
+    """Solve part 2
+    With split = True, simulate each cluster of the circuit on its own (in parallel if processes > 1)
+    """
+    if split:
+        clusters = split_circuit(s)
+        if processes > 1:
+            with Pool(processes) as pool:
+                results = pool.map(cluster_period, clusters)
+        else:
+            results = [cluster_period(cluster) for cluster in clusters]
+        periods = {feeder : result for (_, feeder), result in zip(clusters, results)}
+    else:
+        scheduler = set_up_modules(s)
+        feeders = find_feeders(scheduler)
+        periods = find_periods(CompiledScheduler(scheduler), feeders)
 
-    # so a simple lcm gives the answer
-    print()
-    print('-' * 50)
-    print('Solution:')
-    from math import lcm
-    return lcm(3797, 4051, 3847, 3877)
+    return first_common_push(periods)
     
 
 if __name__ == "__main__":
@@ -6,15 +6,19 @@ My original solution for part 2 was pretty manual and awful, but I got inspirati
 
 The problem input has some nice properties (you can move freely along edges and vertically/horizontally from the start) which I think means we get to the "asymptotic" regime quicker
 
-The key idea is that it takes 262 steps to traverse from (0, 0) on the grid to (0, 0) on the next grid diagonally in the infinite "meta grid" of grids, so you can expect things to work on a period of 262
-And you can reason that the number of garden plots we can reach along this period of 262 grows quadratically
-So just fit a quadratic polynomial to the first few counts of garden plots we can reach on odd steps, and use that to extrapolate to the desired number of steps
+The key idea is that once the walk spreads over the infinite "meta grid" of grids, it repeats itself every time it crosses another grid (a period of 131 steps for a 131x131 grid)
+And you can reason that the number of garden plots we can reach along this period grows quadratically
+So take the counts of garden plots we can reach at num_steps % period + k * period steps for k = 0, 1, 2, ..., until the second differences confirm they're quadratic,
+then use exact integer arithmetic to extrapolate to the desired number of steps
+
+DistanceMapCounter does this another way for many step counts at once: one distance map per way of entering a grid, and counting up the distances
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 21
 
 import numpy as np
+from math import lcm
 
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
@@ -33,110 +37,213 @@ def parse_grid(s):
     grid[i, j] = '.'
     return grid, i ,j
     
-class MetaGridWanderer:
-    """Handles moving us on the infinite meta grid of grids"""
-    
+class FrontierWanderer:
+    """Handles moving us on the infinite meta grid of grids: tracks the reachable locations as boolean arrays over a window of tiled copies of the grid
+    Each step shifts the frontier (locations first reached on the last step) in the 4 directions and masks out rocks and locations already reached,
+    and the counts of locations first reached on even/odd steps are kept as we go
+    """
+
     def __init__(self, s):
         blank_grid, i, j = parse_grid(s)
-        self.blank_grid = blank_grid
-        self.n, self.m = self.blank_grid.shape
-        self.meta_grid = {(0, 0) : self.blank_grid.copy()}
+        self.garden = blank_grid == '.'
+        self.n, self.m = self.garden.shape
         self.num_step = 0
-        self.locs = [(0, 0, i, j)]
-    
+
+        # the window starts as just the original grid, and grows by a ring of grids when the frontier gets to its edge
+        self.radius = 0
+        self.mask = self.garden.copy()
+        self.reached = np.zeros(self.garden.shape, dtype=bool)
+        self.reached[i, j] = True
+        self.frontier = self.reached.copy()
+        self.counts = [1, 0]
+
+    def grow(self):
+        """Add a ring of grids around the window"""
+        self.radius += 1
+        k = 2 * self.radius + 1
+        self.mask = np.tile(self.garden, (k, k))
+        pad = ((self.n, self.n), (self.m, self.m))
+        self.reached = np.pad(self.reached, pad)
+        self.frontier = np.pad(self.frontier, pad)
+
     def wander(self, num_steps):
         """Wander on the meta grid for num_steps"""
-        # during a round of steps, this will hold the steps for the next round
-        locs = []
-        
-        # take all the rounds of steps
         for _ in range(num_steps):
             self.num_step += 1
-            
-            # take a step from each location
-            for k, l, i, j in self.locs:
-                _locs = self.step(k, l, i, j)
-                for loc in _locs:
-                    locs.append(loc)
-    
-            # move the new steps into the queue
-            self.locs, locs = locs, []
-
-    def step(self, k, l, i, j):
-        """Do a single step from (i, j) on grid (k, l)"""
-        steps = []
-        for (io, jo) in ((1, 0), (-1, 0), (0, 1), (0, -1)):
-            _i, _j = i + io, j + jo
-            _k, _l, _i, _j = k + _i // self.n, l + _j // self.m, _i % self.n, _j % self.m
-    
-            if not (_k, _l) in self.meta_grid:
-                self.meta_grid[(_k, _l)] = self.blank_grid.copy()
-            
-            if self.meta_grid[(_k, _l)][_i, _j] == '.':
-                if self.num_step % 2 == 0:
-                    self.meta_grid[(_k, _l)][_i, _j] = 'E'
-                else:
-                    self.meta_grid[(_k, _l)][_i, _j] = 'O'
-                steps.append((_k, _l, _i, _j))
-                
-        return steps
+            f = self.frontier
+            if f[0].any() or f[-1].any() or f[:,0].any() or f[:,-1].any():
+                self.grow()
+                f = self.frontier
+
+            # shift in each direction
+            new = np.zeros(f.shape, dtype=bool)
+            new[1:] |= f[:-1]
+            new[:-1] |= f[1:]
+            new[:,1:] |= f[:,:-1]
+            new[:,:-1] |= f[:,1:]
+
+            # only keep new garden plots
+            new &= self.mask
+            new &= ~self.reached
+            self.reached |= new
+            self.frontier = new
+            self.counts[self.num_step % 2] += int(np.count_nonzero(new))
 
     def count(self, marker):
-        """Count up the 'E' or 'O' markers"""
-        c = 0
-        for grid in self.meta_grid.values():
-            c += len(np.where(grid == marker)[0])
-        return c
+        """Count the locations reached on even ('E') or odd ('O') steps"""
+        return self.counts[0 if marker == 'E' else 1]
+
+def distance_map(garden, i, j):
+    """Distances from (i, j) to every location of a single grid (-1 where unreachable), with the same shift-and-mask steps as FrontierWanderer"""
+    dist = np.full(garden.shape, -1)
+    dist[i, j] = 0
+    frontier = dist == 0
+    d = 0
+    while frontier.any():
+        d += 1
+        new = np.zeros(frontier.shape, dtype=bool)
+        new[1:] |= frontier[:-1]
+        new[:-1] |= frontier[1:]
+        new[:,1:] |= frontier[:,:-1]
+        new[:,:-1] |= frontier[:,1:]
+        new &= garden & (dist < 0)
+        dist[new] = d
+        frontier = new
+    return dist
+
+class DistanceMapCounter:
+    """Answers how many locations we can reach in exactly N steps on the infinite meta grid, for any N, without re-simulating
+    Uses the nice properties of the input (square grid with odd size, start in the center, clear middle row/column and edges):
+    every grid is entered at the middle of an edge (for grids in line with the start) or at a corner (for the rest),
+    at a distance that only depends on how far away the grid is, so one distance map per entry point covers all the grids
+    Then each N is just lookups in cumulative counts of the distance maps (split by parity), with closed forms for the grids that are fully covered
+    """
+
+    def __init__(self, s):
+        blank_grid, i, j = parse_grid(s)
+        garden = blank_grid == '.'
+        n, m = garden.shape
+        c = n // 2
+        assert n == m and n % 2 == 1 and (i, j) == (c, c), 'Needs a square grid with odd size and the start in the center'
+        assert garden[c].all() and garden[:,c].all(), 'Needs a clear middle row and column'
+        assert garden[0].all() and garden[-1].all() and garden[:,0].all() and garden[:,-1].all(), 'Needs clear edges'
+        self.n, self.c = n, c
+
+        # distance maps from the center, the middle of each edge, and each corner
+        self.center = self.cumulative(distance_map(garden, c, c))
+        self.edges = [self.cumulative(distance_map(garden, _i, _j)) for _i, _j in ((0, c), (n-1, c), (c, 0), (c, n-1))]
+        self.corners = [self.cumulative(distance_map(garden, _i, _j)) for _i, _j in ((0, 0), (0, n-1), (n-1, 0), (n-1, n-1))]
+
+    @staticmethod
+    def cumulative(dist):
+        """Counts of locations with distance <= r for each parity, as an array indexed by [parity, r]"""
+        D = dist.max()
+        counts = np.zeros((2, D + 1), dtype=np.int64)
+        for p in (0, 1):
+            counts[p] = np.cumsum(np.bincount(dist[(dist >= 0) & (dist % 2 == p)], minlength=D + 1))
+        return counts
+
+    @staticmethod
+    def lookup(counts, r):
+        """Number of locations with distance <= r and the same parity as r"""
+        if r < 0:
+            return 0
+        return int(counts[r % 2, min(r, counts.shape[1] - 1)])
+
+    def count(self, num_steps):
+        """Number of locations we can reach in exactly num_steps"""
+        n, c = self.n, self.c
+        total = self.lookup(self.center, num_steps)
+
+        # grids in line with the start, k = 0, 1, ... grids past the first one, entered at the middle of an edge
+        R = num_steps - (c + 1)
+        for counts in self.edges:
+            total += self.sum_grids(counts, R, diagonal = False)
+
+        # grids off to the diagonals, with k + 1 grids when k grids past the first one, entered at a corner
+        R = num_steps - 2 * (c + 1)
+        for counts in self.corners:
+            total += self.sum_grids(counts, R, diagonal = True)
+
+        return total
+
+    def sum_grids(self, counts, R, diagonal):
+        """Sum of lookup(counts, R - k * n) over k >= 0 (weighted by k + 1 for the diagonal grids), with closed forms for the fully covered grids"""
+        if R < 0:
+            return 0
+        n = self.n
+        D = counts.shape[1] - 1
+        full = [int(counts[0, D]), int(counts[1, D])]
+
+        # fully covered for k <= k_full: R - k * n has parity (R - k) % 2 since n is odd, so split k by parity
+        k_full = (R - D) // n if R >= D else -1
+        total = 0
+        if k_full >= 0:
+            evens, odds = k_full // 2, (k_full - 1) // 2
+            if diagonal:
+                # sum of k + 1 over k = 0, 2, ..., 2 * evens and k = 1, 3, ..., 2 * odds + 1
+                num_even, num_odd = (evens + 1) ** 2, (odds + 1) * (odds + 2)
+            else:
+                # k = 0, 2, ..., and k = 1, 3, ...
+                num_even, num_odd = evens + 1, odds + 1
+            total += num_even * full[R % 2] + num_odd * full[(R - 1) % 2]
+
+        # the rest are partly covered, and there are only a few of them
+        for k in range(k_full + 1, R // n + 1):
+            total += self.lookup(counts, R - k * n) * (k + 1 if diagonal else 1)
+
+        return total
+
+    def counts(self, step_counts):
+        """Number of locations we can reach for each of a list of step counts"""
+        return [self.count(num_steps) for num_steps in step_counts]
 
 def part1(s):
     """Solve part 1"""
     # 64 steps doesn't leave the original grid so moving on the meta grid is fine
-    w = MetaGridWanderer(s)
+    w = FrontierWanderer(s)
     w.wander(64)
     return w.count('E')
     
     
-def part2(s):
-    """Solve part 2"""
-    # parameters
-    num_steps = 26501365
-    period = 262
-
-    # the offset to look on, and how many periods to do to get the answer
-    offset = 26501365 % period
-    num_periods = 26501365 // period
-    assert offset + num_periods * period == num_steps
-
-    # for taking data on the number of locations we can reach
-    counts = []
-    w = MetaGridWanderer(s)
-
-    # at 0 periods
+def reachable_count(w):
+    """Number of locations we can be on after the steps a wanderer has taken: those first reached on a step of the same parity"""
+    return w.count('E' if w.num_step % 2 == 0 else 'O')
+
+def extrapolate(s, num_steps, max_periods = 20):
+    """Number of locations we can reach in exactly num_steps on the infinite meta grid
+    Sample the counts at offset, offset + period, offset + 2 * period, ... where the period is the size of the grid,
+    until the second differences of the samples repeat (so the counts have settled into a quadratic), then extrapolate with exact integers
+    """
+    w = FrontierWanderer(s)
+    period = lcm(w.n, w.m)
+    offset = num_steps % period
+    num_periods = num_steps // period
+
+    # take data on the number of locations we can reach, until the data is quadratic or we get to num_steps anyway
     w.wander(offset)
-    counts.append(w.count('O'))
-
-    # at 1 period
-    w.wander(period)
-    counts.append(w.count('O'))
-
-    # at 2 periods
-    w.wander(period)
-    counts.append(w.count('O'))
+    counts = [reachable_count(w)]
+    while len(counts) <= num_periods:
+        w.wander(period)
+        counts.append(reachable_count(w))
+        if len(counts) >= 4:
+            d2 = [counts[k] - 2 * counts[k+1] + counts[k+2] for k in (-4, -3)]
+            if d2[0] == d2[1]:
+                break
+        assert len(counts) <= max_periods, 'Counts did not settle into a quadratic'
+
+    if len(counts) > num_periods:
+        return counts[num_periods]
+
+    # Newton's forward differences from the last 3 data points: t * (t-1) is always even so this is exact
+    k = len(counts) - 3
+    a, b, c = counts[-3:]
+    t = num_periods - k
+    return a + t * (b - a) + t * (t - 1) // 2 * (c - 2 * b + a)
 
-    # at 3 periods
-    w.wander(period)
-    counts.append(w.count('O'))
-
-    # fit a quadratic to the first 3 data points
-    coeffs = np.polyfit([0, 1, 2], counts[:3], deg=2)
-    coeffs = [int(np.round(x)) for x in coeffs]
-    p = lambda n : coeffs[0] * n**2 + coeffs[1] * n + coeffs[2]
-
-    # check it matches our data (including the last data point we didn't fit on)
-    for i in range(4):
-        assert p(i) == counts[i]
-    
-    return p(num_periods)
+def part2(s):
+    """Solve part 2"""
+    return extrapolate(s, 26501365)
 
 if __name__ == "__main__":
     with open(f'input{DAY}.txt', 'r') as f:
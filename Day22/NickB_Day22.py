@@ -3,13 +3,23 @@ Day 22: Sand Slabs
 https://adventofcode.com/2023/day/22
 
 I'm proud of how neat the Brick class is, but the falling bricks aren't fast
-Each part takes about 30 seconds to run
+Each part took about 30 seconds to run when moving every brick down one unit at a time (World.fall)
+
+World.settle is much faster: go through the bricks from the bottom up, keeping a height map of the top z for each (x, y) and which brick is there
+Each brick then drops straight to rest on the highest point under it, and the bricks at that height are its supports
+
+Part 2: rather than running Brick.would_fall for every brick, use the dominator tree of the support graph (with the ground as the root)
+A brick falls when some other brick is removed exactly when that other brick dominates it (every path of supports down to the ground goes through it)
+Going from the bottom up, a brick's immediate dominator is the lowest common ancestor of its supports in the tree so far,
+and the number of bricks that would fall is the size of its subtree (minus itself)
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 22
 
 from collections import deque
+import bisect
+import numpy as np
 
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
@@ -20,6 +30,9 @@ def split(s, line_char = '\n', block_char = '\n\n'):
         return out
 
 class Brick:
+    # bricks only keep their coordinates, shadow and support lists, so lots of bricks stay compact
+    __slots__ = ('x1', 'y1', 'z1', 'x2', 'y2', 'z2', 'name', 'shadow', 'supports', 'supporting')
+
     def __init__(self, line, name=''):
         t1, t2 = tuple(line.split('~'))
         self.x1, self.y1, self.z1 = [int(t) for t in t1.split(',')]
@@ -39,14 +52,14 @@ class Brick:
         self.supporting = None # list of bricks that are supported by self
 
     def get_shadow(self):
-        """(x, y) coordinates that we take up"""
+        """(x, y) coordinates that we take up, as a tuple"""
         x1, x2 = tuple(sorted([self.x1, self.x2]))
         y1, y2 = tuple(sorted([self.y1, self.y2]))
 
         if x1 == x2:
-            return {(x1, y) for y in range(y1, y2+1)}
+            return tuple((x1, y) for y in range(y1, y2+1))
         else:
-            return {(x, y1) for x in range(x1, x2+1)}
+            return tuple((x, y1) for x in range(x1, x2+1))
 
     def __repr__(self):
         return self.name
@@ -73,7 +86,7 @@ class Brick:
 
     def shadow_intersects(self, brick):
         """Check if our shadows overlap"""
-        return len(self.shadow & brick.shadow) > 0
+        return not set(self.shadow).isdisjoint(brick.shadow)
     
     def strong_intersects(self, brick):
         """Check if we intersect this other brick as far as top/bottom goes"""
@@ -124,27 +137,70 @@ class Brick:
         # we technically don't fall, since we were removed
         return falls - {self}
 
+class ColumnIndex:
+    """Spatial index from each (x, y) column to the bricks covering it, ordered by z
+    Bricks can't pass through each other, so the order in each column stays the same as bricks fall
+    """
+
+    def __init__(self, bricks):
+        self.columns = {}
+        for brick in sorted(bricks, key=lambda brick: brick.bottom_z):
+            for xy in brick.shadow:
+                self.columns.setdefault(xy, []).append(brick)
+
+    def adjacent(self, brick, xy):
+        """The bricks right below and right above a brick in one of its columns (or None)"""
+        column = self.columns[xy]
+        k = bisect.bisect_left(column, brick.bottom_z, key=lambda _brick: _brick.bottom_z)
+        assert column[k] is brick
+        below = column[k-1] if k > 0 else None
+        above = column[k+1] if k+1 < len(column) else None
+        return below, above
+
+    def neighbors(self, brick):
+        """The bricks right below or above a brick in any of its columns, which are the only ones it can run into"""
+        out = []
+        for xy in brick.shadow:
+            for _brick in self.adjacent(brick, xy):
+                if _brick is not None and _brick not in out:
+                    out.append(_brick)
+        return out
+
+    def below(self, brick):
+        """The bricks directly below and touching a brick"""
+        out = []
+        for xy in brick.shadow:
+            _brick = self.adjacent(brick, xy)[0]
+            if _brick is not None and _brick.top_z == brick.bottom_z - 1 and _brick not in out:
+                out.append(_brick)
+        return out
+
+    def above(self, brick):
+        """The bricks directly above and touching a brick"""
+        out = []
+        for xy in brick.shadow:
+            _brick = self.adjacent(brick, xy)[1]
+            if _brick is not None and _brick.bottom_z == brick.top_z + 1 and _brick not in out:
+                out.append(_brick)
+        return out
+
 class World:
     """Manages bricks"""
     
     def __init__(self, bricks):
         self.bricks = sorted(bricks, key=lambda brick: brick.bottom_z)
-        self.neighbors = self.get_neighbors()
+        self.index = ColumnIndex(self.bricks)
+        self.neighbors = None
 
     def get_neighbors(self):
-        """The bricks each brick could potentially intersect based on shadows, to narrow what each brick can intersect with"""
-        neighbors = {}
-        for brick in self.bricks:
-            neighbors[brick] = []
-            for _brick in self.bricks:
-                if brick == _brick:
-                    continue
-                if brick.shadow_intersects(_brick):
-                    neighbors[brick].append(_brick)
-        return neighbors
+        """The bricks each brick could potentially intersect, to narrow what each brick can intersect with"""
+        return {brick : self.index.neighbors(brick) for brick in self.bricks}
 
     def fall(self):
         """Let all the bricks fall"""
+        if self.neighbors is None:
+            self.neighbors = self.get_neighbors()
+
         something_fell = True
         while something_fell:
             #print('Height', max([brick.top_z for brick in bricks]))
@@ -166,28 +222,89 @@ class World:
                 except:
                     brick.move_up()
 
-    def set_support(self):
-        """Set the supports and supporting for every brick"""
+    def settle(self):
+        """Let all the bricks fall in a single pass from the bottom up, setting the supports and supporting for every brick along the way"""
+        X = max(max(brick.x1, brick.x2) for brick in self.bricks) + 1
+        Y = max(max(brick.y1, brick.y2) for brick in self.bricks) + 1
+
+        # the top z so far at each (x, y), and the index of the brick there (-1 for the ground)
+        heights = np.zeros((X, Y), dtype=int)
+        tops = np.full((X, Y), -1)
+
         for brick in self.bricks:
-            # check what it supports by moving it down 1 and seeing what it intersects
             brick.supports = []
-            brick.move_down()
-            for _brick in self.bricks:
-                if brick == _brick:
-                    continue
-                if brick.strong_intersects(_brick):
-                    brick.supports.append(_brick)
-            brick.move_up()
-
-            # check what it's supporting by moving it up 1 and seeing what it intersects
             brick.supporting = []
-            brick.move_up()
-            for _brick in self.bricks:
-                if brick == _brick:
-                    continue
-                if brick.strong_intersects(_brick):
-                    brick.supporting.append(_brick)
-            brick.move_down()
+
+        for k, brick in enumerate(self.bricks):
+            x, y = np.array(list(brick.shadow)).T
+
+            # drop straight down to rest on the highest point under the brick
+            h = heights[x, y]
+            z = h.max()
+            dz = brick.bottom_z - (z + 1)
+            brick.z1 -= dz
+            brick.z2 -= dz
+
+            # the bricks at that height support this one
+            for _k in set(tops[x, y][h == z].tolist()) - {-1}:
+                brick.supports.append(self.bricks[_k])
+                self.bricks[_k].supporting.append(brick)
+
+            heights[x, y] = brick.top_z
+            tops[x, y] = k
+
+    def set_support(self):
+        """Set the supports and supporting for every brick"""
+        for brick in self.bricks:
+            brick.supports = self.index.below(brick)
+            brick.supporting = self.index.above(brick)
+
+    def fall_counts(self):
+        """Number of bricks that would fall if each brick were removed, from the dominator tree of the support graph
+        Node 0 is the ground and node k+1 is self.bricks[k], so supports always come before the bricks they support
+        Uses binary lifting (up[j][v] is the 2^j-th ancestor of v) for the lowest common ancestors
+        """
+        index = {brick : k + 1 for k, brick in enumerate(self.bricks)}
+        N = len(self.bricks) + 1
+        L = max(1, N.bit_length())
+        up = [[0] * N for _ in range(L)]
+        depth = [0] * N
+
+        def lca(a, b):
+            """Lowest common ancestor of nodes a and b in the dominator tree so far"""
+            if depth[a] < depth[b]:
+                a, b = b, a
+            diff = depth[a] - depth[b]
+            for j in range(L):
+                if diff >> j & 1:
+                    a = up[j][a]
+            if a == b:
+                return a
+            for j in range(L-1, -1, -1):
+                if up[j][a] != up[j][b]:
+                    a, b = up[j][a], up[j][b]
+            return up[0][a]
+
+        for v, brick in enumerate(self.bricks, start=1):
+            # the immediate dominator, which is the ground for bricks resting on it
+            d = 0
+            supports = [index[_brick] for _brick in brick.supports]
+            if supports:
+                d = supports[0]
+                for u in supports[1:]:
+                    d = lca(d, u)
+
+            up[0][v] = d
+            depth[v] = depth[d] + 1
+            for j in range(1, L):
+                up[j][v] = up[j-1][up[j-1][v]]
+
+        # subtree sizes, adding up from the top down since children always come after their parents
+        sizes = [1] * N
+        for v in range(N-1, 0, -1):
+            sizes[up[0][v]] += sizes[v]
+
+        return {brick : sizes[index[brick]] - 1 for brick in self.bricks}
 
     def count_multi_supported(self):
         """Count the bricks that have multiple supports"""
@@ -201,17 +318,15 @@ def part1(s):
     """Solve part 1"""
     bricks = [Brick(line) for line in split(s)]
     w = World(bricks)
-    w.fall()
-    w.set_support()
+    w.settle()
     return w.count_multi_supported()
     
 def part2(s):
     """Solve part 2"""
     bricks = [Brick(line) for line in split(s)]
     w = World(bricks)
-    w.fall()
-    w.set_support()
-    return sum([len(brick.would_fall) for brick in w.bricks])
+    w.settle()
+    return sum(w.fall_counts().values())
     
 
 if __name__ == "__main__":
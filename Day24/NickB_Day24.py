@@ -3,24 +3,21 @@ Day 24: Never Tell Me The Odds
 https://adventofcode.com/2023/day/24
 
 Part 1: I used formulas on this page https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection#Given_two_points_on_each_line_segment
+Originally I clipped each path to the test area and checked every pair of segments in a double loop, with float tolerances
+Now count_crossings checks all the pairs with numpy a block at a time, and only rechecks exactly with integers the pairs that are too close to call in floats
 
-Part 2: I had trouble getting a "direct" system of equations working, so I broke it up into steps. This wasn't pretty.
-1. Find the line that the rock follows, by finding the line that intersects the lines the hailstones travel along.
-    I did do this with pytorch to get x and dx giving a parameterization of the rock's line, since my heart tells me the distance between lines is convex in spirit if you ignore redundancy in parametrizations of lines.
-    The dx I got was precise enough to fix the rock's velocity, but x wasn't precise enough to get an answer.
-2. Use the finalized dx to back out what x (the inital position of the rock) should be.
-    I grabbed two hailstones and checked when the rock would need to hit the first so that later on it hits the second, using two single variable minimizations.
-    This is enough to back out where the rock started.
+Part 2: the rock (position P, velocity V) hits hailstone i (position p_i, velocity v_i) exactly when (P - p_i) x (V - v_i) = 0
+This is quadratic because of the P x V term, but that term is the same for every hailstone, so subtracting the equations for two hailstones gives 3 linear equations
+Two pairs of hailstones give 6 linear equations in the 6 unknowns, which we solve exactly with fractions
 
-In retrospect I should have spent more time working on a single system of equations, and using only 3 or 4 hailstones instead of the full data.
+(My original solution found the rock's line with gradient descent in pytorch and then backed out the position with hand-tuned scipy minimizations.)
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 24
 
-import torch
+from fractions import Fraction
 import numpy as np
-from scipy.optimize import minimize_scalar
 
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
@@ -37,192 +34,147 @@ def parse_hailstone(line):
     dx, dy, dz = [int(t) for t in vect.split(',')]
     return x, y, z, dx, dy, dz
 
-def loc_at_x(hailstone, x):
-    """Get the location of a hailstone at a given value of x"""
-    x0, y0, _, dx, dy, _ = hailstone
-    t = (x - x0) / dx
-    return (t, x, y0 + t * dy)
-
-def loc_at_y(hailstone, y):
-    """Get the location of a hailstone at a given value of y"""
-    x0, y0, _, dx, dy, _ = hailstone
-    t = (y - y0) / dy
-    return (t, x0 + t * dx, y)
-
-def get_key_segment(hailstone, m, M):
-    """Get the segment (represented by its 2 endpoints) that lies within [m, M] bounds for x and y"""
-    x, y, z, dx, dy, dz = hailstone
-
-    # key locations
-    loc_xm = loc_at_x(hailstone, m)
-    loc_xM = loc_at_x(hailstone, M)
-    loc_ym = loc_at_y(hailstone, m)
-    loc_yM = loc_at_y(hailstone, M)
-
-    segment = []
-
-    # if the hailstone at t=0 is within the [m, M] bounds
-    if (m <= x <= M) and (m <= y <= M):
-        segment.append((0, x, y))
-
-    # these check if the hailstone is ever at the m or M bounds (at t >= 0)
-    if (loc_xm[0] >= 0) and (m <= loc_xm[2] <= M):
-        segment.append(loc_xm)
-    if (loc_xM[0] >= 0) and (m <= loc_xM[2] <= M):
-        segment.append(loc_xM)
-    if (loc_ym[0] >= 0) and (m <= loc_ym[1] <= M):
-        segment.append(loc_ym)
-    if (loc_yM[0] >= 0) and (m <= loc_yM[1] <= M):
-        segment.append(loc_yM)
-
-    assert len(segment) <= 2
-
-    return segment
-
-def intersectQ(segment1, segment2):
-    """Check if two segments (given by their endpoints) intersect"""
-    if len(segment1) == 0 or len(segment2) == 0:
+def crosses(h1, h2, m, M):
+    """Check exactly (with integers) if the paths of two hailstones cross inside the [m, M] test area for x and y, at t >= 0 for both
+    The crossing is p1 + t * v1 = p2 + u * v2 with t = t_num / det and u = u_num / det, so multiply everything through by det (made positive)
+    """
+    x1, y1, _, dx1, dy1, _ = h1
+    x2, y2, _, dx2, dy2, _ = h2
+    det = dx1 * dy2 - dy1 * dx2
+    if det == 0:
+        # parallel paths never cross
         return False
+    sign = 1 if det > 0 else -1
+    det *= sign
+    t_num = sign * ((x2 - x1) * dy2 - (y2 - y1) * dx2)
+    u_num = sign * ((x2 - x1) * dy1 - (y2 - y1) * dx1)
+    if t_num < 0 or u_num < 0:
+        return False
+    return ((m - x1) * det <= t_num * dx1 <= (M - x1) * det) and ((m - y1) * det <= t_num * dy1 <= (M - y1) * det)
 
-    (_, x1, y1), (_, x2, y2) = segment1[0], segment1[-1]
-    (_, x3, y3), (_, x4, y4) = segment2[0], segment2[-1]
-    
-    # using https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection#Given_two_points_on_each_line_segment
-    t_numerator = (x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)
-    t_denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-    u_numerator = (x1 - x3) * (y1 - y2) - (y1 - y3) * (x1 - x2)
-    u_denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-
-    if t_denominator < 0:
-        t_numerator *= -1
-        t_denominator *= -1
-
-    if u_denominator < 0:
-        u_numerator *= -1
-        u_denominator *= -1
-
-    return (gte(t_numerator, 0) and gte(t_denominator, t_numerator)) and (gte(u_numerator, 0) and gte(u_denominator, u_numerator))
-
-def equal(x1, x2, tol=1e-6):
-    return abs(x1 - x2) < tol
-
-def gte(x1, x2, tol=1e-6):
-    return x1 - x2 > -tol
-
-class Solver(torch.nn.Module):
-    """Pytorch class for getting an approximate solution to part 2
-    Searches for x and dx (position and direction) for the rock so that the line represented by the rock intersects the lines given by the hailstones
+def count_crossings(hailstones, m, M, block_size = 1 << 20):
+    """Count the pairs of hailstones whose paths cross inside the [m, M] test area, at t >= 0 for both
+    Works on blocks of rows of the all-pairs matrix (about block_size pairs at a time) to keep memory bounded
+    The conditions in crosses are computed in floats along with a bound on their rounding error,
+    and only the pairs where some condition is within that bound of 0 get checked again exactly with crosses
     """
+    n = len(hailstones)
+    H = np.array([h[:2] + h[3:5] for h in hailstones], dtype=np.int64)
+    X, Y, DX, DY = H.T
+    rows = max(1, block_size // max(n, 1))
+    tol = 1e-12
 
-    DTYPE = torch.double
-    
-    def __init__(self, s):
-        """Set up the data X and DX for the hailstones, and x and dx (which we want to find) for the rock"""
-        super().__init__()
-
-        # parse input
-        self.hailstones = [parse_hailstone(line) for line in split(s)]
-
-        # friendlier format
-        self.X = torch.tensor(np.array([list(hailstone[:3]) for hailstone in self.hailstones]), dtype=self.DTYPE)
-        self.DX = torch.tensor(np.array([list(hailstone[3:]) for hailstone in self.hailstones]), dtype=self.DTYPE)
-        self._DX = self.DX / np.linalg.norm(self.DX, axis=1).reshape(-1, 1)
-        self.n = len(self.X)
-
-        # variables for representing the main line
-        self.x = torch.nn.Parameter(torch.randn(3, dtype=self.DTYPE) + self.X.mean(axis=0))
-        self.dx = torch.nn.Parameter(torch.randn(3, dtype=self.DTYPE))
-
-    def forward(self):
-        """Calculate how far the rock's line is from touching the hailstones' lines"""
-        # normalize the direction
-        _dx = torch.nn.functional.normalize(self.dx, dim=0)
+    count = 0
+    for start in range(0, n, rows):
+        I = np.arange(start, min(start + rows, n))[:,None]
+        J = np.arange(start, n)[None,:]
+
+        # differences in integers first, so they're exact before converting to floats
+        x = (X[J] - X[I]).astype(float)
+        y = (Y[J] - Y[I]).astype(float)
+        xm, xM = (m - X[I]).astype(float), (M - X[I]).astype(float)
+        ym, yM = (m - Y[I]).astype(float), (M - Y[I]).astype(float)
+        dx1, dy1 = DX[I].astype(float), DY[I].astype(float)
+        dx2, dy2 = DX[J].astype(float), DY[J].astype(float)
+
+        det = dx1 * dy2 - dy1 * dx2
+        sign = np.sign(det)
+        det = np.abs(det)
+        t_num = sign * (x * dy2 - y * dx2)
+        t_scale = np.abs(x * dy2) + np.abs(y * dx2)
+        u_num = sign * (x * dy1 - y * dx1)
+        u_scale = np.abs(x * dy1) + np.abs(y * dx1)
+
+        # each condition is value >= 0, and scale bounds the size of the terms that went into value
+        conditions = [(t_num, t_scale), (u_num, u_scale)]
+        for d, lo, hi in ((dx1, xm, xM), (dy1, ym, yM)):
+            w = t_num * d
+            w_scale = t_scale * np.abs(d)
+            conditions.append((w - lo * det, w_scale + np.abs(lo * det)))
+            conditions.append((hi * det - w, w_scale + np.abs(hi * det)))
+
+        valid = (J > I) & (det != 0)
+        sure = valid.copy()
+        maybe = valid.copy()
+        for value, scale in conditions:
+            sure &= value > tol * scale
+            maybe &= value >= -tol * scale
+
+        count += int(np.count_nonzero(sure))
+        for i, j in zip(*np.nonzero(maybe & ~sure)):
+            count += crosses(hailstones[start + i], hailstones[start + j], m, M)
 
-        # find normal vectors to planes containing the main line and the data lines
-        normals = torch.nn.functional.normalize(torch.cross(self._DX, _dx.expand_as(self._DX), dim=1), dim=1)
+    return count
 
-        # return the sum of squared distances between lines
-        d1 = (normals * self.X).sum(axis=1)
-        d2 = (normals * self.x).sum(axis=1)
-        return ((d1 - d2)**2).sum()
+def cross_matrix(w):
+    """Matrix M such that M @ P is the cross product P x w"""
+    w0, w1, w2 = w
+    return [[0, w2, -w1], [-w2, 0, w0], [w1, -w0, 0]]
+
+def cross(a, b):
+    """Cross product a x b"""
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+def solve_linear(A, b):
+    """Solve A x = b exactly with Gaussian elimination over fractions, returning None if A is singular"""
+    n = len(A)
+    M = [[Fraction(x) for x in row] + [Fraction(y)] for row, y in zip(A, b)]
+    for c in range(n):
+        # find a row with a nonzero pivot
+        pivot = next((r for r in range(c, n) if M[r][c] != 0), None)
+        if pivot is None:
+            return None
+        M[c], M[pivot] = M[pivot], M[c]
+
+        # clear out the column everywhere else
+        for r in range(n):
+            if r != c and M[r][c] != 0:
+                f = M[r][c] / M[c][c]
+                M[r] = [x - f * y for x, y in zip(M[r], M[c])]
+
+    return [M[r][n] / M[r][r] for r in range(n)]
+
+def rock_equations(h1, h2):
+    """The 3 linear equations in the rock's position P and velocity V we get from a pair of hailstones
+    The rock hits hailstone i exactly when (P - p_i) x (V - v_i) = 0, and subtracting this for two hailstones cancels the P x V term:
+    P x (v_j - v_i) + (p_j - p_i) x V = p_j x v_j - p_i x v_i
+    """
+    p1, v1 = h1[:3], h1[3:]
+    p2, v2 = h2[:3], h2[3:]
+    dv = [b - a for a, b in zip(v1, v2)]
+    dp = [b - a for a, b in zip(p1, p2)]
+
+    # the P part is P x dv, and the V part is dp x V = -(V x dp)
+    MP = cross_matrix(dv)
+    MV = [[-x for x in row] for row in cross_matrix(dp)]
+    A = [MP[k] + MV[k] for k in range(3)]
+    b = [x2 - x1 for x1, x2 in zip(cross(p1, v1), cross(p2, v2))]
+    return A, b
+
+def find_rock(hailstones):
+    """Find the rock's position and velocity exactly, from the equations for the first few hailstones
+    Uses hailstone pairs (0, 1) and (0, 2) for 6 equations in the 6 unknowns, moving on to other hailstones if those equations are degenerate
+    """
+    for k in range(2, len(hailstones)):
+        for j in range(1, k):
+            A1, b1 = rock_equations(hailstones[0], hailstones[j])
+            A2, b2 = rock_equations(hailstones[0], hailstones[k])
+            solution = solve_linear(A1 + A2, b1 + b2)
+            if solution is not None:
+                assert all(x.denominator == 1 for x in solution)
+                return [int(x) for x in solution[:3]], [int(x) for x in solution[3:]]
+    assert False, 'Not enough independent hailstones'
 
 def part1(s):
     """Solve part 1"""
     hailstones = [parse_hailstone(line) for line in split(s)]
-    segments = [get_key_segment(hailstone, 200_000_000_000_000, 400_000_000_000_000) for hailstone in hailstones]
-    
-    count = 0
-    for i in range(len(segments)):
-        for j in range(i + 1, len(segments)):
-            if intersectQ(segments[i], segments[j]):
-                count += 1
-    
-    return count
-    
+    return count_crossings(hailstones, 200_000_000_000_000, 400_000_000_000_000)
+
 def part2(s):
     """Solve part 2"""
-
-    # I ran this next block in a notebook, running the iterate() several times and tweaking the learning rate until it was below 1e10
-
-    # set up the pytorch
-    solver = Solver(s)
-    #criterion = torch.nn.MSELoss(reduction='sum')
-    #y = torch.tensor(0, dtype=solver.DTYPE)
-    #
-    # for running a few iterations
-    #def iterate(iterations, iterations_print, learning_rate):
-    #    optimizer = torch.optim.Adam(solver.parameters(), lr=learning_rate)
-    #    for t in range(1, iterations+1):
-    #        # Forward
-    #        y_pred = solver.forward()
-    #    
-    #        # Compute and print loss
-    #        loss = criterion(y_pred, y)
-    #        if t % iterations_print == 0:
-    #            print(t, loss.item())
-    #    
-    #        # Zero gradients, perform a backward pass, and update the weights.
-    #        optimizer.zero_grad()
-    #        loss.backward()
-    #        optimizer.step()
-    #
-    # manually iterate until we're at acceptable error
-    #iterate(10000, 1000, 1e8)
-
-    # from here I did some messy work in a notebook, but you can just check that after rescaling we have solver.dx = [154, 75, 290]
-    #dx = solver.dx.detach().numpy()
-    #dx = dx / np.linalg.norm(dx)
-    #dx = dx * np.linalg.norm([154, 75, 290])
-
-    # so the only thing left to do is find x (the intial position of the rock), using this finalized dx value (since solver.x is not precise enough)
-
-    # grab two hailstones to work with, chosen so that the rock would first hit x1 and then x2
-    X = solver.X.detach().numpy()
-    DX = solver.DX.detach().numpy()
-    x1 = X[1,:]
-    dx1 = DX[1,:]
-    x2 = X[0,:]
-    dx2 = DX[0,:]
-
-    # using this dx, the goal is to find t for when the rock should hit hailstone 1 and dt for how long the rock would then travel to hit hailstone 2
-    # I did this in a notebook with lots of tweaking, so the optimization bounds here are there just to speed up this demo
-    dx = np.array([154, 75, 290])
-
-    def distance_t_dt(t, dt):
-        """The distance between the rock and hailstone 2 if we launched the rock from hailstone 1 at time t and let it travel for dt"""
-        return np.sum(np.abs((x1 + dx1 * t) + dx * dt - (x2 + dx2 * (t + dt))))
-    
-    def distance_t(t):
-        """The minimum distance between the rock and hailstone 2 if we launched the rock from hailstone 1 at time t"""
-        return minimize_scalar(lambda dt: distance_t_dt(t, dt), bracket=[0.5e12, 0.6e12], tol=1e-20, options={'maxiter' : 10_000}).fun
-
-    # when the rock would need to hit hailstone 1 so that it then goes on to hit hailstone 2
-    t = int(minimize_scalar(distance_t, bracket=[0.2e12, 0.3e12], tol=1e-16, options={'maxiter' : 1_000}).x)
-
-    # back out the intial position of the rock
-    x = list((x1 + dx1 * t) - dx * t)
-    
-    return int(sum(x))
+    hailstones = [parse_hailstone(line) for line in split(s)]
+    x, dx = find_rock(hailstones)
+    return sum(x)
 
 if __name__ == "__main__":
     with open(f'input{DAY}.txt', 'r') as f:
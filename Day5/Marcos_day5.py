@@ -3,7 +3,8 @@ import sys
 sys.path.append("../../aoc_2023")
 
 from aoc_helper import get_input
-from tqdm import tqdm
+import bisect
+import numpy as np
 import re
 import time
 
@@ -60,6 +61,54 @@ class myMapper():
                 return n + rec['delta']
         return n
 
+    def sort(self):
+        """sort the records so get_sorted can binary search them (records can't overlap)"""
+        self.records.sort(key=lambda rec: rec['source_start'])
+        self.starts = [rec['source_start'] for rec in self.records]
+
+    def get_sorted(self, n):
+        i = bisect.bisect_right(self.starts, n) - 1
+        if i >= 0 and n <= self.records[i]['source_end']:
+            return n + self.records[i]['delta']
+        return n
+
+    def get_many(self, seeds):
+        """vectorized get for a numpy array of seeds, with searchsorted over the sorted starts"""
+        self.sort()
+        starts = np.array(self.starts, dtype=np.int64)
+        ends = np.array([rec['source_end'] for rec in self.records], dtype=np.int64)
+        deltas = np.array([rec['delta'] for rec in self.records], dtype=np.int64)
+        seeds = np.asarray(seeds, dtype=np.int64)
+        if len(starts) == 0:
+            return seeds.copy()
+        i = np.searchsorted(starts, seeds, side='right') - 1
+        hit = (i >= 0) & (seeds <= ends[np.maximum(i, 0)])
+        return seeds + np.where(hit, deltas[np.maximum(i, 0)], 0)
+
+    def min_in_range(self, start_range, end_range):
+        """exact lowest output over seeds start_range..end_range (inclusive).
+        output is increasing within a record or a gap, so only the left edge of each piece matters"""
+        self.sort()
+        best = None
+        n = start_range
+        i = bisect.bisect_right(self.starts, n) - 1
+        if i < 0 or n > self.records[i]['source_end']:
+            i += 1
+        while n <= end_range:
+            if i < len(self.records) and self.records[i]['source_start'] <= n:
+                val = n + self.records[i]['delta']
+                n = self.records[i]['source_end'] + 1
+                i += 1
+            else:
+                val = n
+                if i < len(self.records):
+                    n = self.records[i]['source_start']
+                else:
+                    n = end_range + 1
+            if best is None or val < best:
+                best = val
+        return best
+
 
 def process_map(x):
     m = myMapper()
@@ -78,68 +127,60 @@ def process_all_maps(data):
             ], [process_map(row) for row in data[1:]]
 
 
-def process_one_seed(seed, maps):
-    val = seed
-    for map in maps:
-        val = map.get(val)
-    return val
+def compose_maps(maps):
+    """squash the whole chain of maps into one sorted mapper from seed to location.
+    the delta can only change at a record edge of the first map, or at a seed the
+    first map sends to a record edge of the rest of the chain"""
+    first, rest = maps[0], maps[1:]
+    if rest:
+        rest = compose_maps(rest)
+    else:
+        rest = myMapper()
+    first.sort()
+    rest.sort()
+    rest_edges = sorted({n for rec in rest.records for n in (rec['source_start'], rec['source_end'] + 1)})
+    # pieces of the first map with one delta each: its records and the gaps around them
+    pieces = []
+    n = float('-inf')
+    for rec in first.records:
+        if n < rec['source_start']:
+            pieces.append((n, rec['source_start'] - 1, 0))
+        pieces.append((rec['source_start'], rec['source_end'], rec['delta']))
+        n = rec['source_end'] + 1
+    pieces.append((n, float('inf'), 0))
+    # pull back the edges of the rest that each piece lands on, with a bisect
+    edges = set()
+    for start, end, delta in pieces:
+        if start != float('-inf'):
+            edges.add(start)
+        lo = bisect.bisect_left(rest_edges, start + delta)
+        hi = bisect.bisect_right(rest_edges, end + delta)
+        edges.update(n - delta for n in rest_edges[lo:hi])
+    edges = sorted(edges)
+    m = myMapper()
+    for start, end in zip(edges, edges[1:]):
+        delta = rest.get_sorted(first.get_sorted(start)) - start
+        if delta != 0:
+            m.add_data(start + delta, start, end - start)
+    m.sort()
+    return m
 
 
 def solve_part1(data):
+    """squash the maps into one, then look up all the seeds at once"""
     seeds, maps = process_all_maps(data)
-    return min([process_one_seed(x, maps) for x in seeds])
-
-
-def search_seeds(start_range, end_range, maps, current_best=None):
-    """Scan the range at 10000 spots, then pick the lowest and scan down by 1 """
-    search_space = range(start_range, end_range,
-                         (end_range - start_range) // 1000)
-    candidate_seed, candidate_location = sorted([(x, process_one_seed(x, maps))
-                                                 for x in tqdm(search_space)],
-                                                key=lambda x: x[1])[0]
-    loc = candidate_location
-    seed = candidate_seed
-    print(f"Candidate seed {seed} at final loc {loc}")
-    ## it's possible for some other input that the candidate could be larger
-    ## than the best one already, but the by down 1 scan could go below the existing
-    ## lowest. So not sure if this is a universal solution. But if it was  wrong
-    ## I could just turn this optimization off (which I did not use in the original solve)
-
-    if current_best is not None:
-        if current_best < candidate_location:
-            print("returning candidate not final loc")
-            return candidate_location
-
-    print("Scanning for exact")
-
-    while True and seed > start_range:
-        seed = seed - 1
-        new_loc = process_one_seed(seed, maps)
-        if new_loc > loc:
-            break
-        loc = new_loc
-    return loc
+    seed_to_location = compose_maps(maps)
+    return int(seed_to_location.get_many(seeds).min())
 
 
 def solve_part2(test_data):
-    out = []
+    """exact: squash the maps into one, then take the min of each seed range piece by piece"""
     seeds, maps = process_all_maps(test_data)
-    seed_pairs = []
+    seed_to_location = compose_maps(maps)
+    out = []
     for i in range(0, len(seeds), 2):
-        seed_pairs.append((seeds[i], seeds[i + 1]))
-    current_best = None
-    for a, b in seed_pairs:
-        start_range, end_range = a, a + b - 1
-        search_result = search_seeds(start_range,
-                                     end_range,
-                                     maps,
-                                     current_best=current_best)
-        if current_best is None:
-            current_best = search_result
-        elif search_result < current_best:
-            current_best = search_result
-        print(search_result)
-        out.append(search_result)
+        a, b = seeds[i], seeds[i + 1]
+        out.append(seed_to_location.min_in_range(a, a + b - 1))
     return min(out)
 
 
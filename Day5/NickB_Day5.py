@@ -5,13 +5,22 @@ https://adventofcode.com/2023/day/5
 Approach: represent all indices as tuples (id_start, id_end) giving a range of tuples
 So in part 2 we just need to propagate these id ranges through each of the provided maps
 And part 1 is the same, but where our tuples will just be (id, id)
+
+Each map is converted to sorted lists of piece starts and offsets, so an id range is split up with a bisect and a walk over the pieces it covers
+The seven maps are composed into a single seed to location map up front, so each seed (range) is only converted once
 """
 
 # Make sure to have the input in the file f'input{DAY}.txt'
 DAY = 5
 
+import bisect
+import functools
+import math
 import pandas as pd
 
+# the order to apply the maps in
+CONVERSIONS = [('seed', 'soil'), ('soil', 'fertilizer'), ('fertilizer', 'water'), ('water', 'light'), ('light', 'temperature'), ('temperature', 'humidity'), ('humidity', 'location')]
+
 def split(s, line_char = '\n', block_char = '\n\n'):
     """Split into lines of input, or possibly into blocks of lines of input"""
     out = [block.split(line_char) for block in s.strip().split(block_char)]
@@ -56,107 +65,109 @@ def parse_map_line(line):
     start_destination, start_source, length = tuple([int(x) for x in line.split()])
     return start_source, start_destination, length
 
-def augment_map(map, MAX=100000000000):
-    """Add rows to a map so the rows cover the real line (up to +/-MAX)"""
-    id1s = []
-    id2s = []
+def offset_map(map):
+    """Convert a map DataFrame to a piecewise offset map (starts, offsets), as sorted lists covering the whole real line
+    Ids in [starts[k], starts[k+1]) get shifted by offsets[k], and ids before starts[0] aren't shifted
+    """
+    starts = []
+    offsets = []
+    for source_min, source_max, destination_min in zip(map['source_min'], map['source_max'], map['destination_min']):
+        # a row starts a shifted piece, and an unshifted piece starts right after it (unless the next row starts there)
+        if starts and starts[-1] == source_min:
+            starts.pop()
+            offsets.pop()
+        starts.append(int(source_min))
+        offsets.append(int(destination_min - source_min))
+        starts.append(int(source_max) + 1)
+        offsets.append(0)
+
+    return starts, offsets
+
+def apply_map(map, id_range):
+    """Convert a range of ids through a piecewise offset map, giving the list of converted ranges"""
+    starts, offsets = map
+    id_min, id_max = id_range
+
+    # find the piece the range starts in, then walk through the pieces it covers
+    k = bisect.bisect_right(starts, id_min) - 1
+    id_ranges = []
+    while id_min <= id_max:
+        offset = offsets[k] if k >= 0 else 0
+        end = starts[k+1] - 1 if k+1 < len(starts) else id_max
+        _id_max = min(id_max, end)
+        id_ranges.append((id_min + offset, _id_max + offset))
+        id_min = _id_max + 1
+        k += 1
+
+    return id_ranges
+
+def lookup(map, id):
+    """Convert a single id through a piecewise offset map"""
+    starts, offsets = map
+    k = bisect.bisect_right(starts, id) - 1
+    return id + (offsets[k] if k >= 0 else 0)
+
+def compose_maps(map1, map2):
+    """Compose two piecewise offset maps into one that converts ids through map1 then map2
+    The pieces of the composition start at the starts of map1, or at the ids that map1 converts to the starts of map2
+    """
+    starts1, offsets1 = map1
+    starts2, offsets2 = map2
+
+    breakpoints = set(starts1)
+    for k in range(len(starts1) + 1):
+        # the piece of map1 is [lo, hi) with the given offset, with a leading unshifted piece
+        lo = starts1[k-1] if k > 0 else -math.inf
+        hi = starts1[k] if k < len(starts1) else math.inf
+        offset = offsets1[k-1] if k > 0 else 0
+
+        # pull back the starts of map2 that land in the image of this piece
+        for t in starts2[bisect.bisect_right(starts2, lo + offset):bisect.bisect_left(starts2, hi + offset)]:
+            breakpoints.add(t - offset)
+
+    # record the offset of the composition on each piece, merging neighboring pieces with the same offset
+    starts = []
+    offsets = []
+    offset_prev = 0
+    for b in sorted(breakpoints):
+        offset = lookup(map2, lookup(map1, b)) - b
+        if offset != offset_prev:
+            starts.append(b)
+            offsets.append(offset)
+            offset_prev = offset
+
+    return starts, offsets
+
+def parse_maps(s):
+    """Parse the maps (as DataFrames) and convert them to piecewise offset maps, in the order to apply them"""
+    maps = {}
+    for block in split(s)[1:]:
+        source, destination, map = parse_map(block)
+        maps[(source, destination)] = offset_map(map)
 
-    # start the first range
-    id1s.append(-MAX)
-    
-    for row in map[['source_min', 'source_max']].apply(tuple, axis=1):
-        source_min, source_max = row
-    
-        # range that ends right before the row
-        id2s.append(source_min - 1)
-    
-        # range that starts right after the row
-        id1s.append(source_max + 1)
+    return [maps[conversion] for conversion in CONVERSIONS]
 
-    # end the last range
-    id2s.append(MAX)
-    
-    map = pd.concat([map, pd.DataFrame({'source_min' : id1s, 'source_max' : id2s})])
-    map = map.loc[map['source_min'] <= map['source_max']]
-    map['destination_min'] = map['destination_min'].fillna(map['source_min'])
-    map['destination_max'] = map['destination_max'].fillna(map['source_max'])
-    map.sort_values('source_min', inplace=True)
+def seed_to_location(maps):
+    """Compose the maps into a single piecewise offset map from seeds to locations"""
+    return functools.reduce(compose_maps, maps)
 
-    return map
-
-def restrict_map(map, id_range):
-    """Reduce a map to match a provided id range"""
-    map = map.apply(lambda row: restrict_row(row, id_range), axis=1)
-    map = map.loc[map['source_min'] <= map['source_max']]
-    return map
-
-def restrict_row(row, id_range):
-    """Reduce the range of a map row to match the provided id range"""
-    id_min = max(row['source_min'], id_range[0])
-    id_max = min(row['source_max'], id_range[1])
-    offset_min = id_min - row['source_min']
-    offset_max = id_max - row['source_max']
-    row['source_min'] = row['source_min'] + offset_min
-    row['source_max'] = row['source_max'] + offset_max
-    row['destination_min'] = row['destination_min'] + offset_min
-    row['destination_max'] = row['destination_max'] + offset_max
-    #print(row)
-    #print()
-    return row
+def lowest_location(seed_ranges, maps):
+    """Apply the maps to the seed ranges and find the lowest location"""
+    map = seed_to_location(maps)
+    id_ranges = [_id_range for id_range in seed_ranges for _id_range in apply_map(map, id_range)]
+    return int(min([a for a, b in id_ranges]))
 
 def part1(s):
     """Solve part 1"""
     # parse the seeds (as ranges)
     seed_ranges = parse_seeds_1(split(s)[0][0])
-
-    # parse the maps (as DataFrames)
-    maps = {}
-    for block in split(s)[1:]:
-        source, destination, map = parse_map(block)
-        maps[(source, destination)] = map
-
-    # apply the maps to the seeds
-    id_ranges = seed_ranges
-    for conversion in [('seed', 'soil'), ('soil', 'fertilizer'), ('fertilizer', 'water'), ('water', 'light'), ('light', 'temperature'), ('temperature', 'humidity'), ('humidity', 'location')]:
-        map = maps[conversion]
-
-        # first augment the map DataFrame to effectively go from -inf to +inf
-        map = augment_map(map)
-
-        # for each range of ids, restrict the map to match the ids and record the converted ids
-        id_ranges_new = []
-        for id_range in id_ranges:
-            id_ranges_new = id_ranges_new + list(restrict_map(map.copy(), id_range)[['destination_min', 'destination_max']].apply(tuple, axis=1))
-        id_ranges = id_ranges_new
-        
-    return int(min([a for a, b in id_ranges]))
+    return lowest_location(seed_ranges, parse_maps(s))
     
 def part2(s):
     """Solve part 2"""
     # parse the seeds (as ranges)
     seed_ranges = parse_seeds_2(split(s)[0][0])
-
-    # parse the maps (as DataFrames)
-    maps = {}
-    for block in split(s)[1:]:
-        source, destination, map = parse_map(block)
-        maps[(source, destination)] = map
-
-    # apply the maps to the seeds
-    id_ranges = seed_ranges
-    for conversion in [('seed', 'soil'), ('soil', 'fertilizer'), ('fertilizer', 'water'), ('water', 'light'), ('light', 'temperature'), ('temperature', 'humidity'), ('humidity', 'location')]:
-        map = maps[conversion]
-
-        # first augment the map DataFrame to effectively go from -inf to +inf
-        map = augment_map(map)
-
-        # for each range of ids, restrict the map to match the ids and record the converted ids
-        id_ranges_new = []
-        for id_range in id_ranges:
-            id_ranges_new = id_ranges_new + list(restrict_map(map.copy(), id_range)[['destination_min', 'destination_max']].apply(tuple, axis=1))
-        id_ranges = id_ranges_new
-        
-    return int(min([a for a, b in id_ranges]))
+    return lowest_location(seed_ranges, parse_maps(s))
     
 
 if __name__ == "__main__":
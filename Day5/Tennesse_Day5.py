@@ -2,7 +2,10 @@
 Day 5: If You Give A Seed A Fertilizer
 https://adventofcode.com/2023/day/5
 """
+import bisect
+import functools
 import logging
+import math
 from utilities import run_aoc
 from dataclasses import dataclass
 
@@ -13,17 +16,14 @@ def run_part1(input_text: str) -> int:
     the smallest location.
     """
     seeds, maps = parse_input(input_text)
-    # Loop through each of the seeds.
+    # Compose the chain of maps once, then look up each seed.
+    rows = compose_all(maps)
     locations = []
     for num in seeds:
-        logging.debug("Starting with seed: %s", num)
-        # Apply each map.
-        for m in maps:
-            num = map_int(num, m)
-            logging.debug("Mapped to: %s", num)
-        logging.debug("Ended at location: %s", num)
+        location = lookup_int(num, rows)
+        logging.debug("Seed %s ended at location: %s", num, location)
         # Keep track of the final location.
-        locations.append(num)
+        locations.append(location)
     # Return the smallest location.
     return min(locations)
 
@@ -31,7 +31,7 @@ def run_part1(input_text: str) -> int:
 def run_part2(input_text: str) -> int:
     """
     This is a more efficient version of part 1, which maps intervals of seeds
-    instead of individual seeds.
+    instead of individual seeds, through the composed chain of maps.
     """
     seeds, maps = parse_input(input_text)
     # Convert pairs of numbers to interval objects.
@@ -40,10 +40,9 @@ def run_part2(input_text: str) -> int:
     ]
     logging.debug("Starting intervals: %s", intervals)
 
-    # Apply each map in sequence to the list of intervals.
-    for m in maps:
-        logging.debug("Applying map: %s", m)
-        intervals = map_intervals(intervals, m)
+    # Map the intervals through the composed chain of maps.
+    rows = compose_all(maps)
+    intervals = [mapped for i in intervals for mapped in lookup_interval(i, rows)]
     # Return the smallest location.
     return min([i.start for i in intervals])
 
@@ -92,20 +91,6 @@ class Interval:
         """Check if a number is in the interval."""
         return self.start <= num <= self.end
 
-    def intersection(self, other):
-        """Return the intersection of two intervals, or None if they don't overlap."""
-        start = max(self.start, other.start)
-        end = min(self.end, other.end)
-        if start <= end:
-            return Interval(start, end)
-
-    def __lt__(self, other):
-        """Define a total order on intervals, for sorting."""
-        if self.start == other.start:
-            return self.end < other.end
-        else:
-            return self.start < other.start
-
 
 @dataclass
 class MapRow:
@@ -123,65 +108,92 @@ class MapRow:
             offset=dest_start - source_start,
         )
 
-    def split_interval(self, source: Interval) -> tuple[list[Interval], list[Interval]]:
-        """
-        Split an interval into the part that maps and the part that doesn't.
-        This is the core logic for applying a map to an interval.
-        """
-        if source.intersection(self.interval) is None:
-            return [source], []
-        unmapped = []
-        mapped = []
-        if source.start < self.interval.start:
-            unmapped.append(Interval(source.start, self.interval.start - 1))
-        if source.end > self.interval.end:
-            unmapped.append(Interval(self.interval.end + 1, source.end))
-        intersection = source.intersection(self.interval)
-        if intersection:
-            mapped.append(intersection + self.offset)
-        return unmapped, mapped
-
-
-def map_int(num: int, rows: list[MapRow]) -> int:
-    """Map a single integer according to a list of map rows."""
-    for row in rows:
-        if num in row.interval:
-            return num + row.offset
+
+def compose_maps(first: list[MapRow], second: list[MapRow]) -> list[MapRow]:
+    """
+    Compose two maps into a single map, which converts numbers through the
+    first map and then the second. The result is sorted by interval, and
+    only has rows for the numbers that actually get shifted.
+    """
+    first = sorted(first, key=lambda row: row.interval.start)
+    second = sorted(second, key=lambda row: row.interval.start)
+    edges = sorted(
+        {num for row in second for num in [row.interval.start, row.interval.end + 1]}
+    )
+
+    # Split the numbers into pieces that the first map shifts by a single
+    # offset: its rows, and the unshifted gaps around them.
+    pieces = []
+    start = -math.inf
+    for row in first:
+        if start < row.interval.start:
+            pieces.append((Interval(start, row.interval.start - 1), 0))
+        pieces.append((row.interval, row.offset))
+        start = row.interval.end + 1
+    pieces.append((Interval(start, math.inf), 0))
+
+    # The offset of the composition can only change at the start of a piece,
+    # or at numbers that a piece sends to a place where the offset of the
+    # second map changes, which we find with a binary search over the edges.
+    breakpoints = set()
+    for interval, offset in pieces:
+        if interval.start != -math.inf:
+            breakpoints.add(interval.start)
+        lo = bisect.bisect_left(edges, interval.start + offset)
+        hi = bisect.bisect_right(edges, interval.end + offset)
+        breakpoints.update(num - offset for num in edges[lo:hi])
+
+    # Past the last breakpoint neither map shifts anything, so each row
+    # runs from one breakpoint to the next.
+    breakpoints = sorted(breakpoints)
+    rows = []
+    for start, end in zip(breakpoints, breakpoints[1:]):
+        offset = lookup_int(lookup_int(start, first), second) - start
+        if offset != 0:
+            rows.append(MapRow(interval=Interval(start, end - 1), offset=offset))
+    logging.debug("Composed maps into %s rows", len(rows))
+    return rows
+
+
+def compose_all(maps: list[list[MapRow]]) -> list[MapRow]:
+    """Compose the whole chain of maps into a single seed to location map."""
+    return functools.reduce(compose_maps, maps)
+
+
+def lookup_int(num: int, rows: list[MapRow]) -> int:
+    """
+    Map a single integer according to a sorted list of non-overlapping map
+    rows (like the output of compose_maps), using a binary search.
+    """
+    k = bisect.bisect_right(rows, num, key=lambda row: row.interval.start) - 1
+    if k >= 0 and num in rows[k].interval:
+        return num + rows[k].offset
     return num
 
 
-def map_intervals(intervals: list[Interval], rows: list[MapRow]) -> list[Interval]:
-    """Map a list of intervals according to a list of map rows."""
-    # Copy to avoid modifying the input.
-    unmapped_intervals = intervals.copy()
-    # Array to store the mapped output.
-    mapped_intervals = []
-    for row in rows:
-        # Copy to avoid modifying while iterating through the array.
-        to_map = unmapped_intervals
-        unmapped_intervals = []
-        # Apply the map to each interval.
-        for interval in to_map:
-            new_unmapped, new_mapped = row.split_interval(interval)
-            # Unmapped intervals are added back to the list to be
-            # processed by subsequent map rows.
-            unmapped_intervals.extend(new_unmapped)
-            # Map intervals are added to the output. They won't be
-            # processed by subsequent map rows, since only the
-            # first row that they intersect with should map them.
-            mapped_intervals.extend(new_mapped)
-            # Log for debugging.
-            if new_mapped:
-                logging.debug(
-                    "Split %s into %s and %s",
-                    interval,
-                    new_unmapped,
-                    new_mapped,
-                )
-            else:
-                logging.debug("No change to %s", interval)
-    # Return both the mapped and unmapped intervals, sorted lexographically.
-    return sorted(unmapped_intervals + mapped_intervals)
+def lookup_interval(interval: Interval, rows: list[MapRow]) -> list[Interval]:
+    """
+    Map an interval according to a sorted list of non-overlapping map rows
+    (like the output of compose_maps), using a binary search to find the
+    first row it could overlap.
+    """
+    mapped = []
+    start = interval.start
+    k = bisect.bisect_left(rows, start, key=lambda row: row.interval.end)
+    while start <= interval.end:
+        if k < len(rows) and rows[k].interval.start <= start:
+            # Inside a row, so shift up to the end of the row.
+            end = min(interval.end, rows[k].interval.end)
+            mapped.append(Interval(start, end) + rows[k].offset)
+            k += 1
+        else:
+            # In a gap, so leave alone up to the start of the next row.
+            end = interval.end
+            if k < len(rows):
+                end = min(end, rows[k].interval.start - 1)
+            mapped.append(Interval(start, end))
+        start = end + 1
+    return mapped
 
 
 if __name__ == "__main__":